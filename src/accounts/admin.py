@@ -1,9 +1,17 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
+from . import bulk_actions
+from .export import export_users
 from .forms import UserChangeForm, UserCreationForm
 from .models import User
+from .search import search_users
 
 
 @admin.register(User)
@@ -63,8 +71,17 @@ class UserAdmin(BaseUserAdmin):
         "activate",
         "deactivate",
         "set_unusable_password",
+        "export_csv",
+        "export_ndjson",
     ]
 
+    def get_search_results(self, request, queryset, search_term):
+        # Served by the trigram indexes, see accounts.search
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return search_users(queryset, search_term), False
+
     def get_urls(self):
         from django.urls import re_path
 
@@ -74,21 +91,78 @@ class UserAdmin(BaseUserAdmin):
                 self.admin_site.admin_view(self.user_change_password),
                 name="auth_user_password_change",
             ),
+            re_path(
+                r"^bulk-jobs/(\w+)/resume/$",
+                self.admin_site.admin_view(self.resume_bulk_job),
+                name="accounts_user_resume_bulk_job",
+            ),
         ] + super().get_urls()
 
+    def changelist_view(self, request, extra_context=None):
+        if request.method == "GET":
+            self.message_bulk_jobs(request)
+        return super().changelist_view(request, extra_context)
+
+    def message_bulk_jobs(self, request):
+        for job in bulk_actions.pop_user_jobs(request.user.pk):
+            action = self.get_action(job["action"])[2]
+            progress = _("%(action)s: %(processed)s of %(total)s users processed.") % {
+                "action": action,
+                "processed": job["processed"],
+                "total": job["total"],
+            }
+            if job["status"] == bulk_actions.DONE:
+                self.message_user(request, progress, messages.SUCCESS)
+            elif job["status"] == bulk_actions.FAILED:
+                url = reverse("admin:accounts_user_resume_bulk_job", args=(job["id"],))
+                self.message_user(
+                    request,
+                    format_html('{} {} <a href="{}">{}</a>', progress, job["error"], url, _("Resume")),
+                    messages.ERROR,
+                )
+            else:
+                self.message_user(request, progress, messages.INFO)
+
+    def resume_bulk_job(self, request, job_id):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        bulk_actions.resume_job(job_id)
+        return redirect("admin:accounts_user_changelist")
+
+    def run_bulk_action(self, request, action, queryset):
+        """
+        Applies the action right away to small selections and starts a
+        background job for the large ones (see accounts.bulk_actions).
+        """
+        limit = settings.ADMIN_BULK_ACTION_INLINE_LIMIT
+        pks = list(queryset.order_by().values_list("pk", flat=True)[: limit + 1])
+        if len(pks) <= limit:
+            bulk_actions.apply_action(action, pks)
+            return
+        bulk_actions.start_job(action, queryset, request.user.pk)
+        self.message_user(request, _("The action is running in the background, reload the page to see the progress."))
+
     def activate(self, request, queryset):
-        queryset.update(is_active=True)
+        self.run_bulk_action(request, "activate", queryset)
 
     activate.short_description = _("Activate")
 
     def deactivate(self, request, queryset):
-        queryset.update(is_active=False)
+        self.run_bulk_action(request, "deactivate", queryset)
 
     deactivate.short_description = _("Deactivate")
 
     def set_unusable_password(self, request, queryset):
-        for q in queryset:
-            q.set_unusable_password()
-            q.save()
+        self.run_bulk_action(request, "set_unusable_password", queryset)
 
     set_unusable_password.short_description = _("Set unusable password")
+
+    def export_csv(self, request, queryset):
+        return export_users(request, queryset, "csv")
+
+    export_csv.short_description = _("Export as CSV")
+
+    def export_ndjson(self, request, queryset):
+        return export_users(request, queryset, "ndjson")
+
+    export_ndjson.short_description = _("Export as NDJSON")
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from accounts.api import async_views
+
+async_api_urlpatterns = [
+    path("register/", async_views.AsyncRegisterView.as_view(), name="register"),
+    path("login/", async_views.AsyncLoginView.as_view(), name="login"),
+    path("logout/", async_views.AsyncLogoutView.as_view(), name="logout"),
+    path("profile/", async_views.AsyncUserProfileView.as_view(), name="profile"),
+    path("activate/<uidb64>/<token>/", async_views.AsyncActivateAccountView.as_view(), name="activate"),
+]
@@ -0,0 +1,202 @@
+"""
+Async versions of the account endpoints, served under `/api/async/`.
+
+They are meant to run under ASGI (the `prod` entrypoint command with
+`ASGI=1`). The ORM is used through its async API and passwords are hashed in
+the hashing pool, so the event loop is never blocked by them. The cache,
+Redis and email queueing calls, which have no async client, run in threads.
+"""
+
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.decorators import classonlymethod
+from django.utils.encoding import force_str
+from django.utils.http import http_date, urlsafe_base64_decode
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.cache import get_user_version, profile_cache_key
+from accounts.events import ACCOUNT_VERIFIED, PROFILE_UPDATED, SESSION_REVOKED, apublish_account_event
+from accounts.mail import queue_activation_email
+from accounts.models import User
+from accounts.tokens import RevocableRefreshToken
+from accounts.utils import account_activation_token
+
+from .authentication import CachedJWTAuthentication
+from .serializers import UserProfileSerializer, UserSerializer
+from .throttling import LoginRateThrottle, RegisterRateThrottle
+
+
+class AsyncAPIView(View):
+    """
+    A minimal async counterpart of DRF's `APIView`: it parses JSON bodies,
+    authenticates bearer tokens, applies the throttles and renders JSON with
+    the DRF renderer, including the DRF error format.
+    """
+
+    authentication_required = False
+    throttle_classes = ()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Bearer token requests are not subject to CSRF, as in `APIView`
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.authenticator = CachedJWTAuthentication()
+        request = Request(request, parsers=[JSONParser()])
+        try:
+            if self.authentication_required:
+                request.user = await self.authenticate(request)
+            for throttle in (throttle_class() for throttle_class in self.throttle_classes):
+                if not await sync_to_async(throttle.allow_request)(request, self):
+                    raise exceptions.Throttled(throttle.wait())
+            handler = getattr(self, request.method.lower(), None)
+            if handler is None or request.method.lower() not in self.http_method_names:
+                raise exceptions.MethodNotAllowed(request.method)
+            return await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        result = await sync_to_async(self.authenticator.authenticate)(request)
+        if result is None:
+            raise exceptions.NotAuthenticated
+        return result[0]
+
+    def handle_exception(self, exc):
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.status_code = status.HTTP_401_UNAUTHORIZED
+            headers["WWW-Authenticate"] = self.authenticator.authenticate_header(None)
+        if isinstance(exc, exceptions.Throttled) and exc.wait:
+            headers["Retry-After"] = str(math.ceil(exc.wait))
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        return self.render(data, exc.status_code, headers)
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        return HttpResponse(
+            JSONRenderer().render(data),
+            status=status_code,
+            content_type="application/json",
+            headers=headers,
+        )
+
+
+class AsyncRegisterView(AsyncAPIView):
+    throttle_classes = (RegisterRateThrottle,)
+
+    async def post(self, request):
+        serializer = UserSerializer(data=request.data)
+        # The unique email validator queries the database
+        if not await sync_to_async(serializer.is_valid)():
+            raise exceptions.ValidationError(serializer.errors)
+        data = serializer.validated_data
+        user = await User.objects.acreate_user(data.get("email", ""), data["name"], data["password"])
+
+        await sync_to_async(queue_activation_email)(user)
+        refresh = await sync_to_async(RevocableRefreshToken.for_user)(user)
+        return self.render(
+            {
+                "user": UserSerializer(user).data,
+                "access": str(refresh.access_token),
+                "refresh": str(refresh),
+            },
+            status.HTTP_201_CREATED,
+        )
+
+
+class AsyncLoginView(AsyncAPIView):
+    throttle_classes = (LoginRateThrottle,)
+
+    async def post(self, request):
+        errors = {field: ["This field is required."] for field in ("email", "password") if not request.data.get(field)}
+        if errors:
+            raise exceptions.ValidationError(errors)
+
+        user = await aauthenticate(request._request, email=request.data["email"], password=request.data["password"])
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                "No active account found with the given credentials", "no_active_account"
+            )
+        if not user.is_verified:
+            raise exceptions.ValidationError({"non_field_errors": ["Email is not verified."]})
+
+        refresh = await sync_to_async(RevocableRefreshToken.for_user)(user)
+        return self.render({"refresh": str(refresh), "access": str(refresh.access_token)})
+
+
+class AsyncLogoutView(AsyncAPIView):
+    authentication_required = True
+
+    async def post(self, request):
+        try:
+            token = await sync_to_async(RevocableRefreshToken)(request.data["refresh"])
+            await sync_to_async(token.blacklist)()
+        except Exception:
+            return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+        await apublish_account_event(request.user.pk, SESSION_REVOKED, jti=token[api_settings.JTI_CLAIM])
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+class AsyncUserProfileView(AsyncAPIView):
+    authentication_required = True
+
+    async def get(self, request):
+        user = request.user
+        version = await sync_to_async(get_user_version)(user.pk)
+        etag = f'"{user.pk}-{version}"'
+        last_modified = int(user.updated_at.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = profile_cache_key(user.pk, version)
+            data = await cache.aget(key)
+            if data is None:
+                data = dict(UserProfileSerializer(user).data)
+                await cache.aset(key, data, settings.ACCOUNTS_USER_CACHE_TIMEOUT)
+            response = self.render(data)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    async def put(self, request, partial=False):
+        serializer = UserProfileSerializer(request.user, data=request.data, partial=partial)
+        if not await sync_to_async(serializer.is_valid)():
+            raise exceptions.ValidationError(serializer.errors)
+        await sync_to_async(serializer.save)()
+        await apublish_account_event(request.user.pk, PROFILE_UPDATED, **serializer.data)
+        return self.render(serializer.data)
+
+    async def patch(self, request):
+        return await self.put(request, partial=True)
+
+
+class AsyncActivateAccountView(AsyncAPIView):
+    async def get(self, request, uidb64, token):
+        try:
+            user = await User.objects.aget(pk=force_str(urlsafe_base64_decode(uidb64)))
+        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+            user = None
+
+        if user is None or not account_activation_token.check_token(user, token):
+            return self.render({"detail": "Activation link is invalid"}, status.HTTP_400_BAD_REQUEST)
+
+        user.is_verified = True
+        await user.asave()
+        await apublish_account_event(user.pk, ACCOUNT_VERIFIED)
+        return self.render({"detail": "Account activated successfully"})
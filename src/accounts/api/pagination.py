@@ -0,0 +1,12 @@
+from core.pagination import KeysetPagination
+
+
+class UserPagination(KeysetPagination):
+    # Served by the (date_joined, id) and (name, id) indexes in both directions
+    orderings = {
+        "-date_joined": "date_joined",
+        "date_joined": "date_joined",
+        "name": "name",
+        "-name": "name",
+    }
+    default_ordering = "-date_joined"
@@ -9,4 +9,7 @@ api_urlpatterns = [
     path("change-password/", views.ChangePasswordView.as_view(), name="change-password"),
     path("profile/", views.UserProfileView.as_view(), name="profile"),
     path("activate/<uidb64>/<token>/", views.ActivateAccountView.as_view(), name="activate"),
+    path("users/", views.UserListView.as_view(), name="user-list"),
+    path("users/search/", views.UserSearchView.as_view(), name="user-search"),
+    path("users/export/", views.UserExportView.as_view(), name="user-export"),
 ]
@@ -1,11 +1,27 @@
 from django.contrib.auth.password_validation import validate_password
+from django.db.models.functions import Lower
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
 from accounts.models import User
+from accounts.tokens import RevocableRefreshToken
+from core.serializers import CompiledReadMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UniqueEmailValidator(UniqueValidator):
+    """
+    Case-insensitive uniqueness of the email, served by the unique index on
+    `lower(email)`.
+    """
+
+    message = "A user with this email already exists."
+
+    def filter_queryset(self, value, queryset, field_name):
+        return queryset.alias(email_lower=Lower(field_name)).filter(email_lower=value.lower())
+
+
+class UserSerializer(CompiledReadMixin, serializers.ModelSerializer):
     password = serializers.CharField(
         min_length=9,
         max_length=20,
@@ -32,6 +48,9 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "name", "password", "email")
+        extra_kwargs = {
+            "email": {"validators": [UniqueEmailValidator(queryset=User.objects.all())]},
+        }
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -41,16 +60,38 @@ class ChangePasswordSerializer(serializers.Serializer):
     new_password = serializers.CharField(required=True)
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(CompiledReadMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("email", "name")
         read_only_fields = ("email",)
 
 
+class UserListSerializer(CompiledReadMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ("id", "email", "name", "is_active", "is_verified", "is_staff", "date_joined")
+        read_only_fields = fields
+
+
+class UserSearchSerializer(CompiledReadMixin, serializers.ModelSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = ("id", "email", "name", "is_active", "rank")
+        read_only_fields = fields
+
+
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RevocableRefreshToken
+
     def validate(self, attrs):
         data = super().validate(attrs)
         if not self.user.is_verified:
             raise serializers.ValidationError("Email is not verified.")
         return data
+
+
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
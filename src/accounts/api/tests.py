@@ -1,8 +1,24 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from accounts.admin import UserAdmin
+from accounts.cache import user_cache_key
 from accounts.models import User
+from accounts.revocation import CacheRevocationBackend, DatabaseRevocationBackend, get_revocation_backend
+from accounts.tokens import RevocableRefreshToken
+from accounts.utils import account_activation_token
+from core.redis import get_redis_connection
 
 
 class UserProfileTests(APITestCase):
@@ -23,3 +39,216 @@ class UserProfileTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.user.refresh_from_db()
         self.assertEqual(self.user.name, "Updated Name")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="cached@example.com", password="testpass123", name="Cached User")
+        self.url = reverse("accounts_api:profile")
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["email"], self.user.email)
+
+    def test_password_is_not_cached(self):
+        self.client.get(self.url)
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertIn("password", cached.get_deferred_fields())
+
+    def test_save_invalidates_cache(self):
+        self.client.get(self.url)
+        self.user.name = "Renamed"
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["name"], "Renamed")
+
+    def test_admin_deactivate_invalidates_cache(self):
+        self.client.get(self.url)
+        UserAdmin(User, admin.site).deactivate(None, User.objects.filter(pk=self.user.pk))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ConditionalProfileTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="etag@example.com", password="testpass123", name="ETag User")
+        self.url = reverse("accounts_api:profile")
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_not_modified_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_cached_representation(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data, {"email": "etag@example.com", "name": "ETag User"})
+
+    def test_etag_changes_on_update(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.patch(self.url, {"name": "New Name"})
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["name"], "New Name")
+
+
+@override_settings(CACHES={**settings.CACHES, "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RefreshTokenRevocationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="revoke@example.com", password="testpass123", name="Revoke User")
+        self.refresh = RevocableRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+
+    def test_logout_revokes_refresh_token(self):
+        response = self.client.post(reverse("accounts_api:logout"), {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_without_logout(self):
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+
+    def test_revocation_survives_clearing_the_cache(self):
+        self.client.post(reverse("accounts_api:logout"), {"refresh": str(self.refresh)})
+        cache.clear()
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_expires_with_token(self):
+        backend = CacheRevocationBackend()
+        with mock.patch.object(caches["revocation"], "set") as cache_set:
+            backend.revoke(self.refresh)
+        key, value, timeout = cache_set.call_args.args
+        self.assertEqual(key, backend.get_key(self.refresh))
+        self.assertLessEqual(timeout, self.refresh["exp"] - int(time.time()))
+        self.assertGreater(timeout, 0)
+
+    def test_backend_follows_settings(self):
+        self.assertIsInstance(get_revocation_backend(), CacheRevocationBackend)
+        backend = "accounts.revocation.DatabaseRevocationBackend"
+        with (
+            override_settings(SIMPLE_JWT={**settings.SIMPLE_JWT, "REVOCATION_BACKEND": backend}),
+            mock.patch.object(DatabaseRevocationBackend, "__init__", return_value=None),
+        ):
+            self.assertIsInstance(get_revocation_backend(), DatabaseRevocationBackend)
+        self.assertIsInstance(get_revocation_backend(), CacheRevocationBackend)
+
+
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        get_redis_connection().flushdb()
+        self.url = reverse("accounts_api:login")
+
+    @override_settings(
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"login_ip": "100/min", "login_email": "2/min"},
+        }
+    )
+    def test_login_is_throttled_by_email(self):
+        for _ in range(2):
+            response = self.client.post(self.url, {"email": "victim@example.com", "password": "wrong"})
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with mock.patch("accounts.models.User.check_password") as check_password:
+            response = self.client.post(self.url, {"email": "Victim@example.com", "password": "wrong"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        check_password.assert_not_called()
+
+        response = self.client.post(self.url, {"email": "other@example.com", "password": "wrong"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"login_ip": "1/min"}},
+    )
+    def test_login_is_throttled_by_ip(self):
+        self.client.post(self.url, {"email": "one@example.com", "password": "wrong"})
+        response = self.client.post(self.url, {"email": "two@example.com", "password": "wrong"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+@override_settings(CACHES={**settings.CACHES, "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AsyncAccountViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_redis_connection().flushdb()
+
+    async def test_register_activate_login_logout(self):
+        with mock.patch("accounts.api.async_views.queue_activation_email") as queue_activation_email:
+            response = await self.async_client.post(
+                reverse("accounts_async_api:register"),
+                {"email": "async@example.com", "name": "Async User", "password": "testpass123"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = queue_activation_email.call_args.args[0]
+        self.assertEqual(response.json()["user"], {"id": user.pk, "name": "Async User", "email": "async@example.com"})
+
+        login = {"email": "async@example.com", "password": "testpass123"}
+        response = await self.async_client.post(
+            reverse("accounts_async_api:login"), login, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        token = account_activation_token.make_token(user)
+        response = await self.async_client.get(reverse("accounts_async_api:activate", args=(uid, token)))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = await self.async_client.post(
+            reverse("accounts_async_api:login"), login, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tokens = response.json()
+
+        response = await self.async_client.post(
+            reverse("accounts_async_api:logout"),
+            {"refresh": tokens["refresh"]},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {tokens['access']}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    async def test_profile(self):
+        user = await User.objects.acreate_user("profile@example.com", "Profile User", "testpass123")
+        auth = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        url = reverse("accounts_async_api:profile")
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get(url, headers=auth)
+        self.assertEqual(response.json(), {"email": "profile@example.com", "name": "Profile User"})
+        response = await self.async_client.get(url, headers={**auth, "If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await self.async_client.patch(
+            url, {"name": "Renamed"}, content_type="application/json", headers=auth
+        )
+        self.assertEqual(response.json()["name"], "Renamed")
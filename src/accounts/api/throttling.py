@@ -0,0 +1,14 @@
+from core.throttling import SlidingWindowThrottle
+
+
+class LoginRateThrottle(SlidingWindowThrottle):
+    scope = "login"
+
+
+class RegisterRateThrottle(SlidingWindowThrottle):
+    scope = "register"
+
+
+class TokenRefreshRateThrottle(SlidingWindowThrottle):
+    scope = "token_refresh"
+    key_types = ("ip", "global")
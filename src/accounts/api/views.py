@@ -1,28 +1,50 @@
 from django.conf import settings
-from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils.encoding import force_str
-from django.utils.http import urlsafe_base64_decode
-from django.utils.encoding import force_bytes
-from django.utils.http import urlsafe_base64_encode
-from drf_spectacular.utils import OpenApiResponse, extend_schema, extend_schema_view
+from django.utils.http import http_date, urlsafe_base64_decode
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema, extend_schema_view
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import UpdateAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from accounts.cache import get_user_version, profile_cache_key
+from accounts.events import (
+    ACCOUNT_VERIFIED,
+    PASSWORD_CHANGED,
+    PROFILE_UPDATED,
+    SESSION_REVOKED,
+    publish_account_event,
+)
+from accounts.export import FORMATS, export_users
+from accounts.mail import queue_activation_email
 from accounts.models import User
-from accounts.tasks import send_email
+from accounts.search import rank_users
+from accounts.tokens import RevocableRefreshToken
 from accounts.utils import account_activation_token
 
-from .serializers import ChangePasswordSerializer, MyTokenObtainPairSerializer, UserProfileSerializer, UserSerializer
+from .pagination import UserPagination
+from .serializers import (
+    ChangePasswordSerializer,
+    MyTokenObtainPairSerializer,
+    UserListSerializer,
+    UserProfileSerializer,
+    UserSearchSerializer,
+    UserSerializer,
+)
+from .throttling import LoginRateThrottle, RegisterRateThrottle
 
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    throttle_classes = (RegisterRateThrottle,)
 
     @extend_schema(
         responses=UserSerializer,
@@ -40,35 +62,17 @@ class RegisterView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
 
-        # mail settings
-        current_site = settings.SITE_URL
-        mail_subject = "Activate your account"
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        token = account_activation_token.make_token(user)
-        activation_link = f"http://{current_site}/api/activate/{uid}/{token}/"
-        message = render_to_string(
-            "email/activation_email.html",
-            {
-                "user": user,
-                "activation_link": activation_link,
-            },
-        )
-
-        # Send verification email via Celery
-        send_email.delay(
-            user.id,
-            mail_subject=mail_subject,
-            message=message,
-        )
+        # Queue the verification email, it is sent by the outbox flush task
+        queue_activation_email(user)
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = RevocableRefreshToken.for_user(user)
         access_token = str(refresh.access_token)
         refresh_token = str(refresh)
 
         # Prepare the response data
         response_data = {
-            "user": UserSerializer(user, context=self.get_serializer_context()).data,
+            "user": serializer.data,
             "access": access_token,
             "refresh": refresh_token,
         }
@@ -82,6 +86,7 @@ class RegisterView(generics.CreateAPIView):
 )
 class LoginView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_classes = (LoginRateThrottle,)
 
 
 class LogoutView(APIView):
@@ -98,9 +103,10 @@ class LogoutView(APIView):
         try:
             # Get the refresh token from the request data
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
-            # Blacklist the refresh token
+            token = RevocableRefreshToken(refresh_token)
+            # Revoke the refresh token through the configured revocation backend
             token.blacklist()
+            publish_account_event(request.user.pk, SESSION_REVOKED, jti=token[api_settings.JTI_CLAIM])
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -132,6 +138,7 @@ class ChangePasswordView(UpdateAPIView):
             # Set the new password
             self.object.set_password(serializer.data.get("new_password"))
             self.object.save()
+            publish_account_event(self.object.pk, PASSWORD_CHANGED)
             return Response({"detail": "Password updated successfully."}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -152,6 +159,7 @@ class ActivateAccountView(APIView):
             if account_activation_token.check_token(user, token):
                 user.is_verified = True
                 user.save()
+                publish_account_event(user.pk, ACCOUNT_VERIFIED)
                 return Response({"detail": "Account activated successfully"}, status=status.HTTP_200_OK)
             return Response({"detail": "Activation link is invalid"}, status=status.HTTP_400_BAD_REQUEST)
         except (TypeError, ValueError, OverflowError, User.DoesNotExist):
@@ -177,3 +185,108 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
 
     def get_object(self):
         return self.request.user
+
+    def perform_update(self, serializer):
+        serializer.save()
+        publish_account_event(serializer.instance.pk, PROFILE_UPDATED, **serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        # The ETag is built from the user's version which changes on every
+        # save, so a conditional request is answered from the cache only.
+        user = self.get_object()
+        version = get_user_version(user.pk)
+        etag = f'"{user.pk}-{version}"'
+        last_modified = int(user.updated_at.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = profile_cache_key(user.pk, version)
+            data = cache.get(key)
+            if data is None:
+                data = dict(self.get_serializer(user).data)
+                cache.set(key, data, settings.ACCOUNTS_USER_CACHE_TIMEOUT)
+            response = Response(data)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(name, bool, description=f"Only the users with the given `{name}`.")
+        for name in ("is_active", "is_verified", "is_staff")
+    ],
+)
+class UserListView(generics.ListAPIView):
+    """
+    Lists the users, the newest first by default. The pages are selected by
+    an opaque cursor, so every page costs the same as the first one.
+    """
+
+    permission_classes = (IsAdminUser,)
+    serializer_class = UserListSerializer
+    pagination_class = UserPagination
+    filter_fields = ("is_active", "is_verified", "is_staff")
+
+    def get_queryset(self):
+        queryset = User.objects.all()
+        for name in self.filter_fields:
+            value = self.request.query_params.get(name)
+            if value is None:
+                continue
+            if value.lower() not in ("true", "false", "1", "0"):
+                raise ValidationError({name: "Must be a valid boolean."})
+            queryset = queryset.filter(**{name: value.lower() in ("true", "1")})
+        return queryset
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter("q", str, required=True, description="At least 3 characters of the email or the name."),
+        OpenApiParameter("limit", int, description="Maximal number of the results (100 at most)."),
+    ],
+)
+class UserSearchView(generics.ListAPIView):
+    """
+    Searches the users by email and name, the best matches first.
+    """
+
+    permission_classes = (IsAdminUser,)
+    serializer_class = UserSearchSerializer
+    min_length = 3
+    default_limit = 20
+    max_limit = 100
+
+    def get_queryset(self):
+        term = self.request.query_params.get("q", "").strip()
+        if len(term) < self.min_length:
+            raise ValidationError({"q": f"Ensure this field has at least {self.min_length} characters."})
+        try:
+            limit = min(int(self.request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError({"limit": "A valid integer is required."}) from None
+        return rank_users(User.objects.all(), term)[: max(limit, 1)]
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter("export_format", str, enum=list(FORMATS), default="csv"),
+    ],
+    responses={(200, content_type): OpenApiTypes.BINARY for content_type in FORMATS.values()},
+)
+class UserExportView(APIView):
+    """
+    Streams all the users as CSV or NDJSON, gzip-compressed if the client
+    accepts it.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format not in FORMATS:
+            raise ValidationError({"export_format": f"Choose one of: {', '.join(FORMATS)}."})
+        return export_users(request, User.objects.all(), export_format)
@@ -0,0 +1,151 @@
+"""
+Admin bulk actions executed by Celery on large querysets.
+
+The primary keys of the selected users are stored with the job in Redis
+(a sorted set, as plain data), and the `run_bulk_action` task updates them
+in chunks of `ADMIN_BULK_ACTION_CHUNK_SIZE` users in primary key order.
+Every chunk is a single UPDATE, and the task queues itself again for the
+next chunk. The job remembers the last processed primary key, so a failed
+job is resumed where it stopped. Chunks are idempotent, so repeating one is
+harmless.
+"""
+
+from itertools import islice
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from accounts.cache import invalidate_user_cache
+from accounts.models import User
+from core.redis import get_redis_connection
+
+JOB_KEY = "accounts:bulk-job:{id}"
+JOB_PKS_KEY = "accounts:bulk-job:{id}:pks"
+USER_JOBS_KEY = "accounts:bulk-jobs:{user_id}"
+JOB_TIMEOUT = 7 * 24 * 60 * 60
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+ACTIONS = {
+    "activate": lambda: {"is_active": True},
+    "deactivate": lambda: {"is_active": False},
+    "set_unusable_password": lambda: {"password": make_password(None)},
+}
+
+
+def apply_action(action, pks):
+    """
+    Applies the action to the users with the given primary keys.
+    """
+    User.objects.filter(pk__in=pks).update(updated_at=timezone.now(), **ACTIONS[action]())
+    invalidate_user_cache(*pks)
+
+
+def start_job(action, queryset, user_id):
+    """
+    Stores the job with the primary keys of the queryset and queues its
+    first chunk. Returns the job id.
+    """
+    from accounts.tasks import run_bulk_action
+
+    job_id = uuid4().hex
+    key = JOB_KEY.format(id=job_id)
+    pks_key = JOB_PKS_KEY.format(id=job_id)
+    user_jobs_key = USER_JOBS_KEY.format(user_id=user_id)
+    redis = get_redis_connection()
+    total = 0
+    chunk_size = settings.ADMIN_BULK_ACTION_CHUNK_SIZE
+    pks = queryset.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size)
+    while batch := list(islice(pks, chunk_size)):
+        redis.zadd(pks_key, {pk: pk for pk in batch})
+        total += len(batch)
+    with redis.pipeline() as pipe:
+        pipe.hset(
+            key,
+            mapping={"action": action, "status": PENDING, "total": total, "processed": 0, "last_pk": ""},
+        )
+        pipe.expire(key, JOB_TIMEOUT)
+        pipe.expire(pks_key, JOB_TIMEOUT)
+        pipe.sadd(user_jobs_key, job_id)
+        pipe.expire(user_jobs_key, JOB_TIMEOUT)
+        pipe.execute()
+    run_bulk_action.delay(job_id)
+    return job_id
+
+
+def get_job(job_id):
+    job = get_redis_connection().hgetall(JOB_KEY.format(id=job_id))
+    if not job:
+        return None
+    job = {key.decode(): value.decode() for key, value in job.items()}
+    job["id"] = job_id
+    job["total"] = int(job["total"])
+    job["processed"] = int(job["processed"])
+    return job
+
+
+def update_job(job_id, **values):
+    get_redis_connection().hset(JOB_KEY.format(id=job_id), mapping=values)
+
+
+def run_chunk(job_id):
+    """
+    Applies the action of the job to the next chunk of users. Returns True
+    if there are more users to process.
+    """
+    job = get_job(job_id)
+    if job is None or job["status"] == DONE:
+        return False
+
+    chunk_size = settings.ADMIN_BULK_ACTION_CHUNK_SIZE
+    pks_key = JOB_PKS_KEY.format(id=job_id)
+    after = f"({job['last_pk']}" if job["last_pk"] else "-inf"
+    pks = [int(pk) for pk in get_redis_connection().zrangebyscore(pks_key, after, "+inf", start=0, num=chunk_size)]
+    if pks:
+        apply_action(job["action"], pks)
+
+    more = len(pks) == chunk_size
+    key = JOB_KEY.format(id=job_id)
+    with get_redis_connection().pipeline() as pipe:
+        pipe.hset(key, mapping={"status": RUNNING if more else DONE, "last_pk": pks[-1] if pks else job["last_pk"]})
+        pipe.hincrby(key, "processed", len(pks))
+        if not more:
+            pipe.delete(pks_key)
+        pipe.execute()
+    return more
+
+
+def resume_job(job_id):
+    """
+    Queues the failed job again, it continues after the last processed user.
+    """
+    from accounts.tasks import run_bulk_action
+
+    job = get_job(job_id)
+    if job is None or job["status"] != FAILED:
+        return False
+    update_job(job_id, status=PENDING, error="")
+    run_bulk_action.delay(job_id)
+    return True
+
+
+def pop_user_jobs(user_id):
+    """
+    Returns the jobs started by the user. The finished jobs are forgotten
+    after they have been returned once.
+    """
+    redis = get_redis_connection()
+    user_jobs_key = USER_JOBS_KEY.format(user_id=user_id)
+    jobs = []
+    for job_id in sorted(job_id.decode() for job_id in redis.smembers(user_jobs_key)):
+        job = get_job(job_id)
+        if job is None or job["status"] == DONE:
+            redis.srem(user_jobs_key, job_id)
+        if job is not None:
+            jobs.append(job)
+    return jobs
@@ -0,0 +1,64 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from accounts.models import User
+
+USER_CACHE_KEY = "accounts:user:{pk}"
+USER_VERSION_KEY = "accounts:user:{pk}:version"
+PROFILE_CACHE_KEY = "accounts:profile:{pk}:{version}"
+
+
+def user_cache_key(pk):
+    return USER_CACHE_KEY.format(pk=pk)
+
+
+def get_user_version(pk):
+    """
+    Returns the version of the user's data. The version is dropped together
+    with the cached user, and a missing version is replaced by a new random
+    one, so a version is never reused after a change.
+    """
+    key = USER_VERSION_KEY.format(pk=pk)
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_cached_user(pk):
+    """
+    Returns the user with the given primary key from the cache, loading it
+    from the database on a miss. The password hash is deferred, so it is
+    never stored in the cache. Returns `None` if the user does not exist.
+    """
+    key = user_cache_key(pk)
+    user = cache.get(key)
+    if user is None:
+        try:
+            # From the primary: after a change which doesn't pin the user
+            # (e.g. a deactivation by an admin or a Celery task), a lagging
+            # replica would cache the old row for everyone
+            user = User.objects.db_manager(DEFAULT_DB_ALIAS).defer("password").get(pk=pk)
+        except (User.DoesNotExist, ValueError, TypeError):
+            return None
+        cache.set(key, user, settings.ACCOUNTS_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user_cache(*pks):
+    """
+    Removes the cached entries of the given users and bumps their versions.
+    It must be called after any change that bypasses `User.save()`, e.g.
+    `QuerySet.update()`.
+    """
+    if pks:
+        cache.delete_many([key.format(pk=pk) for pk in pks for key in (USER_CACHE_KEY, USER_VERSION_KEY)])
+
+
+def profile_cache_key(pk, version):
+    return PROFILE_CACHE_KEY.format(pk=pk, version=version)
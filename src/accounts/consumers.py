@@ -0,0 +1,29 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from accounts.events import user_group_name
+
+
+class AccountEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes the account events of the authenticated user to the socket. The
+    user is authenticated by `accounts.middleware.JWTAuthMiddleware`.
+    """
+
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = user_group_name(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def account_event(self, message):
+        await self.send_json({"event": message["event"], "data": message["data"]})
@@ -0,0 +1,44 @@
+"""
+Account events pushed to the user's open WebSockets (see
+`accounts.consumers.AccountEventsConsumer`), so the clients don't have to
+poll the profile endpoint.
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+ACCOUNT_VERIFIED = "account.verified"
+PROFILE_UPDATED = "profile.updated"
+PASSWORD_CHANGED = "password.changed"
+SESSION_REVOKED = "session.revoked"
+
+
+def user_group_name(user_id):
+    return f"accounts.user.{user_id}"
+
+
+def build_message(event, data):
+    return {"type": "account.event", "event": event, "data": data}
+
+
+def publish_account_event(user_id, event, **data):
+    """
+    Sends the event to the user's sockets when the current transaction is
+    committed.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    send = async_to_sync(channel_layer.group_send)
+    transaction.on_commit(lambda: send(user_group_name(user_id), build_message(event, data)))
+
+
+async def apublish_account_event(user_id, event, **data):
+    """
+    Async version of `publish_account_event()` for the views running in
+    autocommit mode.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        await channel_layer.group_send(user_group_name(user_id), build_message(event, data))
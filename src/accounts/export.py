@@ -0,0 +1,132 @@
+"""
+Streaming export of the users as CSV or NDJSON.
+
+The rows are read with `QuerySet.iterator()`, which uses a server-side
+cursor on PostgreSQL, and projected with `values_list()`, so no model
+instances are built and the memory usage doesn't depend on the number of
+users. The output is optionally gzip-compressed while it is streamed.
+
+Under ASGI the chunks are streamed from an async iterator, each one
+produced in the thread of the request's sync code, otherwise Django would
+consume the whole export before sending it.
+"""
+
+import csv
+import re
+import zlib
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from core.renderers import dumps
+
+EXPORT_FIELDS = ("id", "email", "name", "is_active", "is_verified", "is_staff", "date_joined", "last_login")
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+# The rows are joined into chunks of this size before they are sent
+BUFFER_SIZE = 64 * 1024
+# The spreadsheets evaluate the cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+accepts_gzip = re.compile(r"\bgzip\b")
+
+
+class Echo:
+    """
+    File-like object returning the written value, used to format single
+    rows with `csv.writer`.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, fields=EXPORT_FIELDS):
+    return queryset.order_by("pk").values_list(*fields).iterator(chunk_size=settings.ACCOUNTS_EXPORT_CHUNK_SIZE)
+
+
+def escape_formula(value):
+    """
+    Prefixes the text starting like a formula with a quote, so the user
+    values (e.g. the names) aren't run by a spreadsheet opening the file.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def iter_csv(rows, fields=EXPORT_FIELDS):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([escape_formula(value) for value in row])
+
+
+def iter_ndjson(rows, fields=EXPORT_FIELDS):
+    for row in rows:
+        yield dumps(dict(zip(fields, row, strict=True)), orjson.OPT_APPEND_NEWLINE)
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """
+    Joins the lines (text or bytes) into chunks of about `size` bytes.
+    """
+    buffer = []
+    length = 0
+    for line in lines:
+        if isinstance(line, str):
+            line = line.encode()
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+async def aiter_chunks(chunks):
+    # The rows are read in the thread of the sync code, which holds the
+    # connection of the server-side cursor
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def export_users(request, queryset, export_format):
+    """
+    Returns the streaming response with the users in the given format,
+    compressed if the client accepts gzip.
+    """
+    lines = (iter_csv if export_format == "csv" else iter_ndjson)(iter_rows(queryset))
+    content = buffered(lines)
+    compress = accepts_gzip.search(request.headers.get("Accept-Encoding", ""))
+    if compress:
+        content = gzipped(content)
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        content = aiter_chunks(content)
+
+    response = StreamingHttpResponse(content, content_type=FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="users.{export_format}"'
+    if compress:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,117 @@
+"""
+Password hashing off the request thread.
+
+The hashers are CPU bound, so `make_password()` and `verify_password()` run
+in a bounded process pool of `PASSWORD_HASHING_WORKERS` processes. A burst of
+logins queues up in the pool instead of pinning every web worker. Set
+`PASSWORD_HASHING_WORKERS` to 0 to hash inline.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker(password_hashers):
+    import django
+
+    django.setup()
+    settings.PASSWORD_HASHERS = password_hashers
+
+
+def _verify_password(password, encoded):
+    """
+    Returns whether the password is correct and the new hash of the password
+    if it has to be upgraded to the preferred hasher (`None` otherwise).
+    """
+    is_correct, must_update = hashers.verify_password(password, encoded)
+    if is_correct and must_update:
+        return True, hashers.make_password(password)
+    return is_correct, None
+
+
+def get_executor():
+    global _executor  # noqa: PLW0603
+
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(list(settings.PASSWORD_HASHERS),),
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor  # noqa: PLW0603
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+@receiver(setting_changed)
+def reset_executor(setting, **kwargs):
+    if setting in ("PASSWORD_HASHERS", "PASSWORD_HASHING_WORKERS"):
+        shutdown_executor()
+
+
+def _run(func, *args):
+    executor = get_executor()
+    if executor is None:
+        return func(*args)
+    try:
+        return executor.submit(func, *args).result()
+    except BrokenProcessPool:
+        # A pool process died, start a new pool for the next call.
+        shutdown_executor()
+        return func(*args)
+
+
+def make_password(password):
+    if password is None:
+        # Unusable passwords are random strings, there is nothing to hash.
+        return hashers.make_password(None)
+    return _run(hashers.make_password, password)
+
+
+def make_passwords(passwords):
+    """
+    Hashes a batch of passwords, spreading them across the pool processes.
+    """
+    passwords = list(passwords)
+    executor = get_executor()
+    if executor is None or not any(password is not None for password in passwords):
+        return [hashers.make_password(password) for password in passwords]
+    try:
+        return list(executor.map(hashers.make_password, passwords, chunksize=32))
+    except BrokenProcessPool:
+        shutdown_executor()
+        return [hashers.make_password(password) for password in passwords]
+
+
+def verify_password(password, encoded):
+    return _run(_verify_password, password, encoded)
+
+
+async def amake_password(password):
+    return await sync_to_async(make_password, thread_sensitive=False)(password)
+
+
+async def averify_password(password, encoded):
+    return await sync_to_async(verify_password, thread_sensitive=False)(password, encoded)
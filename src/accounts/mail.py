@@ -0,0 +1,229 @@
+"""
+Micro-batched delivery of the transactional emails.
+
+`queue_email()` pushes the message to an outbox list in Redis and schedules
+a flush of the outbox `EMAIL_BATCH_WINDOW` seconds later, unless one is
+already scheduled. The flush sends the whole batch over a single mail
+connection. The messages over the per-domain rate limits are deferred to
+the next minute, and the failed ones are retried after
+`EMAIL_RETRY_DELAY` seconds, doubled on every attempt. A deferred message
+keeps its place in the outbox with a `not_before` time, and the flushes
+skip it until then.
+
+The flush moves the batch to a processing list and removes every message
+from it only once it's sent, requeued or given up, so the delivery is
+at-least-once: the messages left over by a failed flush are returned to
+the outbox, and the ones of a crashed worker by the next flush.
+"""
+
+import json
+import logging
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from accounts.utils import account_activation_token
+from core.redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "accounts:mail:outbox"
+PROCESSING_KEY = "accounts:mail:processing"
+DELIVERY_LOCK_KEY = "accounts:mail:delivery-lock"
+FLUSH_SCHEDULED_KEY = "accounts:mail:flush-scheduled"
+RATE_LIMIT_KEY = "accounts:mail:rate:{domain}:{window}"
+
+
+def queue_email(subject, message, recipient_list):
+    get_redis_connection().rpush(
+        OUTBOX_KEY,
+        json.dumps({"subject": subject, "message": message, "to": list(recipient_list), "attempts": 0}),
+    )
+    schedule_flush()
+
+
+def queue_activation_email(user):
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = account_activation_token.make_token(user)
+    activation_link = f"http://{settings.SITE_URL}/api/activate/{uid}/{token}/"
+    message = render_to_string(
+        "email/activation_email.html",
+        {
+            "user": user,
+            "activation_link": activation_link,
+        },
+    )
+    queue_email("Activate your account", message, [user.email])
+
+
+def schedule_flush():
+    from accounts.tasks import flush_email_outbox
+
+    window = settings.EMAIL_BATCH_WINDOW
+    if get_redis_connection().set(FLUSH_SCHEDULED_KEY, 1, nx=True, px=max(int(window * 1000), 1)):
+        flush_email_outbox.apply_async(countdown=window)
+
+
+def claim_batch(size):
+    """
+    Moves up to `size` messages from the outbox to the processing list.
+    Returns the raw messages, which are acknowledged by `ack()`.
+    """
+    with get_redis_connection().pipeline() as pipe:
+        for _ in range(size):
+            pipe.lmove(OUTBOX_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+        return [raw for raw in pipe.execute() if raw is not None]
+
+
+def ack(raw, requeued=None):
+    """
+    Removes the message from the processing list, optionally pushing its
+    updated copy back to the outbox in the same transaction.
+    """
+    with get_redis_connection().pipeline() as pipe:
+        if requeued is not None:
+            pipe.rpush(OUTBOX_KEY, json.dumps(requeued))
+        pipe.lrem(PROCESSING_KEY, 1, raw)
+        pipe.execute()
+
+
+def schedule_retry(due):
+    """
+    Schedules a flush at the time the first deferred message is due.
+    """
+    from accounts.tasks import flush_email_outbox
+
+    flush_email_outbox.apply_async(countdown=max(due - time.time(), 0))
+
+
+def restore_processing():
+    """
+    Returns the unacknowledged messages to the head of the outbox, in their
+    original order.
+    """
+    redis = get_redis_connection()
+    while redis.lmove(PROCESSING_KEY, OUTBOX_KEY, "RIGHT", "LEFT") is not None:
+        pass
+
+
+def get_limited_keys(recipients):
+    """
+    Returns the counter keys of the current minute of the recipient domains
+    with a limit in `EMAIL_DOMAIN_RATE_LIMITS`, with the limits.
+    """
+    limits = settings.EMAIL_DOMAIN_RATE_LIMITS
+    domains = {email.rpartition("@")[2].lower() for email in recipients} & limits.keys()
+    window = int(time.time() // 60)
+    return {RATE_LIMIT_KEY.format(domain=domain, window=window): limits[domain] for domain in domains}
+
+
+def within_rate_limit(recipients):
+    """
+    Returns whether a message to the recipients is within the per-minute
+    limits of their domains.
+    """
+    keys = get_limited_keys(recipients)
+    if not keys:
+        return True
+    counts = get_redis_connection().mget(list(keys))
+    return all(int(count or 0) < limit for count, limit in zip(counts, keys.values(), strict=True))
+
+
+def count_sent(recipients):
+    """
+    Counts the sent message against the limits of the recipient domains.
+    """
+    if keys := get_limited_keys(recipients):
+        with get_redis_connection().pipeline() as pipe:
+            for key in keys:
+                pipe.incr(key)
+                pipe.expire(key, 60)
+            pipe.execute()
+
+
+def deliver_outbox():
+    """
+    Sends one batch of the outbox. Returns the number of the sent messages.
+    """
+    redis = get_redis_connection()
+    token = uuid4().hex
+    if not redis.set(DELIVERY_LOCK_KEY, token, nx=True, px=int(settings.EMAIL_DELIVERY_LOCK_TIMEOUT * 1000)):
+        # Another flush is running, it schedules the next one if needed
+        return 0
+
+    try:
+        # Left over by a worker which died during the delivery
+        restore_processing()
+        batch = claim_batch(settings.EMAIL_BATCH_SIZE)
+        if not batch:
+            return 0
+        try:
+            sent, deferred, next_due = send_batch(batch)
+        except Exception:
+            restore_processing()
+            schedule_flush()
+            raise
+    finally:
+        if redis.get(DELIVERY_LOCK_KEY) == token.encode():
+            redis.delete(DELIVERY_LOCK_KEY)
+
+    if redis.llen(OUTBOX_KEY) > deferred:
+        # Messages which this flush didn't see
+        schedule_flush()
+    elif next_due is not None:
+        schedule_retry(next_due)
+    return sent
+
+
+def send_batch(batch):
+    """
+    Sends the messages of the batch which are due. Returns the number of the
+    sent and the deferred messages, and when the first deferred one is due.
+    """
+    sent = 0
+    deferred = []
+    connection = get_connection(fail_silently=False)
+    with connection:
+        for raw in batch:
+            item = json.loads(raw)
+            now = time.time()
+            if item.get("not_before", 0) <= now and not within_rate_limit(item["to"]):
+                # In the next window of the limits, without counting an attempt
+                item["not_before"] = (now // 60 + 1) * 60
+            if item.get("not_before", 0) > now:
+                ack(raw, requeued=item)
+                deferred.append(item["not_before"])
+                continue
+
+            message = EmailMessage(
+                item["subject"],
+                item["message"],
+                settings.DEFAULT_FROM_EMAIL,
+                item["to"],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception:
+                item["attempts"] += 1
+                if item["attempts"] < settings.EMAIL_MAX_ATTEMPTS:
+                    logger.warning("Failed to send email to %s, will retry", item["to"], exc_info=True)
+                    item["not_before"] = now + settings.EMAIL_RETRY_DELAY * 2 ** (item["attempts"] - 1)
+                    ack(raw, requeued=item)
+                    deferred.append(item["not_before"])
+                else:
+                    logger.exception("Failed to send email to %s, giving up", item["to"])
+                    ack(raw)
+                # The connection may be broken after a failure
+                connection.close()
+                connection.open()
+            else:
+                sent += 1
+                count_sent(item["to"])
+                ack(raw)
+    return sent, len(deferred), min(deferred, default=None)
@@ -0,0 +1,44 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports users from a CSV or NDJSON file with the email, name and optional password fields. "
+        "Users without a password get an unusable one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Path to the file, or "-" to read from stdin.')
+        parser.add_argument("--format", choices=("csv", "ndjson"), help="Detected from the file extension by default.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+
+        if path == "-":
+            self.import_users(sys.stdin, file_format, options["batch_size"])
+            return
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                self.import_users(f, file_format, options["batch_size"])
+        except OSError as e:
+            raise CommandError(e) from e
+
+    def import_users(self, f, file_format, batch_size):
+        rows = csv.DictReader(f) if file_format == "csv" else (json.loads(line) for line in f if line.strip())
+        start = time.monotonic()
+
+        def progress(processed, imported):
+            rate = processed / (time.monotonic() - start)
+            self.stdout.write(f"{processed} rows processed, {imported} users imported ({rate:.0f} rows/s)")
+
+        imported = User.objects.bulk_create_users(rows, batch_size=batch_size, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} users in {time.monotonic() - start:.1f}s"))
@@ -0,0 +1,39 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+from accounts.api.authentication import CachedJWTAuthentication
+
+
+@database_sync_to_async
+def get_user(raw_token):
+    authentication = CachedJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections by the access token passed in the
+    `token` query string parameter (browsers can't set headers on sockets)
+    or in the "Authorization: Bearer <token>" header. The other sockets
+    are anonymous.
+    """
+
+    def get_raw_token(self, scope):
+        headers = dict(scope.get("headers", []))
+        authorization = headers.get(b"authorization", b"").split()
+        if len(authorization) == 2 and authorization[0].lower() == b"bearer":
+            return authorization[1]
+        token = parse_qs(scope.get("query_string", b"").decode()).get("token")
+        return token[0].encode() if token else None
+
+    async def __call__(self, scope, receive, send):
+        raw_token = self.get_raw_token(scope)
+        user = await get_user(raw_token) if raw_token else AnonymousUser()
+        return await super().__call__(dict(scope, user=user), receive, send)
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+INDEXES = [
+    models.Index(fields=["date_joined", "id"], name="accounts_user_joined_id_idx"),
+    models.Index(fields=["name", "id"], name="accounts_user_name_id_idx"),
+]
+
+
+def create_indexes(apps, schema_editor):
+    model = apps.get_model("accounts", "User")
+    for index in INDEXES:
+        if schema_editor.connection.vendor == "postgresql":
+            # Built concurrently, so the table stays writable on large databases
+            schema_editor.execute(str(index.create_sql(model, schema_editor, concurrently=True)))
+        else:
+            schema_editor.add_index(model, index)
+
+
+def drop_indexes(apps, schema_editor):
+    model = apps.get_model("accounts", "User")
+    for index in INDEXES:
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(str(index.remove_sql(model, schema_editor, concurrently=True)))
+        else:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0004_user_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name="user", index=index) for index in INDEXES],
+            database_operations=[migrations.RunPython(create_indexes, drop_indexes)],
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+CONSTRAINT = models.UniqueConstraint(
+    Lower("email"),
+    name="accounts_user_email_ci_unique",
+    violation_error_message="This email address is already registered by another user.",
+)
+
+
+def check_duplicates(apps, schema_editor):
+    """
+    Stops the migration if some emails differ only by case, these accounts
+    have to be merged or renamed by hand first.
+    """
+    User = apps.get_model("accounts", "User")
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .values(email_lower=Lower("email"))
+        .annotate(count=models.Count("pk"))
+        .filter(count__gt=1)
+        .values_list("email_lower", flat=True)
+        .order_by("email_lower")
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"Found {len(duplicates)} emails registered more than once with a different case, "
+            f"resolve them before migrating: {', '.join(duplicates[:20])}"
+        )
+
+
+def create_constraint(apps, schema_editor):
+    model = apps.get_model("accounts", "User")
+    if schema_editor.connection.vendor == "postgresql":
+        # Built concurrently, so the table stays writable on large databases
+        schema_editor.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {CONSTRAINT.name} ON accounts_user (lower(email))")
+    else:
+        schema_editor.add_constraint(model, CONSTRAINT)
+
+
+def drop_constraint(apps, schema_editor):
+    model = apps.get_model("accounts", "User")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {CONSTRAINT.name}")
+    else:
+        schema_editor.remove_constraint(model, CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0005_user_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddConstraint(model_name="user", constraint=CONSTRAINT)],
+            database_operations=[migrations.RunPython(create_constraint, drop_constraint)],
+        ),
+    ]
@@ -1,29 +1,31 @@
+from itertools import islice
+
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from accounts import hashing
+
 
 class UserManager(BaseUserManager):
     """
     Creates and saves a User with the given email, phone, password and optional extra info.
     """
 
-    def _create_user(self, email, name, password, is_staff, is_superuser, **extra_fields):
-        """
-        Creates and saves a User with the given username, email and password.
-        """
+    def _build_user(self, email, name, is_staff, is_superuser, **extra_fields):
         now = timezone.now()
 
         if not email:
             raise ValueError("The given email must be set")
 
         email = self.normalize_email(email)
-        user = self.model(
+        return self.model(
             email=email,
             name=name or "",
             is_staff=is_staff,
@@ -33,13 +35,33 @@ class UserManager(BaseUserManager):
             last_login=now,
             **extra_fields,
         )
+
+    def _create_user(self, email, name, password, is_staff, is_superuser, **extra_fields):
+        """
+        Creates and saves a User with the given username, email and password.
+        """
+        user = self._build_user(email, name, is_staff, is_superuser, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
 
+    async def _acreate_user(self, email, name, password, is_staff, is_superuser, **extra_fields):
+        user = self._build_user(email, name, is_staff, is_superuser, **extra_fields)
+        user.password = await hashing.amake_password(password)
+        user._password = password
+        await user.asave(using=self._db)
+        return user
+
     def create_user(self, email, name, password=None, **extra_fields):
         return self._create_user(email, name, password, False, False, **extra_fields)
 
+    async def acreate_user(self, email, name, password=None, **extra_fields):
+        """
+        Async version of `create_user()`, the password is hashed without
+        blocking the event loop.
+        """
+        return await self._acreate_user(email, name, password, False, False, **extra_fields)
+
     def create_superuser(self, email, name, password=None, **extra_fields):
         """
         Creates and saves a superuser with the given email,
@@ -47,8 +69,102 @@ class UserManager(BaseUserManager):
         """
         return self._create_user(email, name, password, True, True, **extra_fields)
 
+    def bulk_create_users(self, rows, batch_size=5000, progress=None):
+        """
+        Imports users from an iterable of dicts with the `email`, `name` and
+        optional `password` keys. Rows are consumed in batches, so the memory
+        usage does not depend on the number of rows. Passwords are hashed in
+        the password hashing pool, rows without a password get an unusable one.
+
+        Emails which already exist (case-insensitively), both in the database
+        and earlier in the input, are skipped. The `progress` callable is
+        called after each batch with the number of processed and imported
+        rows. Returns the number of imported users.
+        """
+        db = self._db or router.db_for_write(self.model)
+        rows = iter(rows)
+        processed = imported = 0
+        while batch := list(islice(rows, batch_size)):
+            processed += len(batch)
+            batch = [
+                (self.normalize_email(row["email"]), row.get("name") or "", row.get("password") or None)
+                for row in batch
+                if row.get("email")
+            ]
+            passwords = hashing.make_passwords(password for _, _, password in batch)
+            batch = [(email, name, password) for (email, name, _), password in zip(batch, passwords, strict=True)]
+            with transaction.atomic(using=db):
+                if connections[db].vendor == "postgresql":
+                    imported += self._copy_users(db, batch)
+                else:
+                    imported += self._bulk_create_users(db, batch)
+            if progress:
+                progress(processed, imported)
+        return imported
+
+    def _copy_users(self, db, batch):
+        """
+        Loads the batch into a staging table with COPY and merges it into the
+        user table in a single statement.
+        """
+        from core.db import copy_rows
+
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        staging = "accounts_user_import"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {staging} "
+                "(email varchar(255), name varchar(255), password varchar(128)) ON COMMIT DROP"
+            )
+            copy_rows(cursor, staging, ("email", "name", "password"), batch)
+            cursor.execute(
+                f"INSERT INTO {table} "
+                "(email, name, password, is_staff, is_superuser, is_active, is_verified, date_joined, updated_at) "
+                "SELECT DISTINCT ON (lower(s.email)) "
+                "s.email, s.name, s.password, false, false, true, false, now(), now() "
+                f"FROM {staging} s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table} u WHERE lower(u.email) = lower(s.email)) "
+                "ORDER BY lower(s.email) "
+                "ON CONFLICT DO NOTHING"
+            )
+            imported = cursor.rowcount
+            # ON COMMIT DROP only fires at the end of the outermost transaction,
+            # inside an outer one the next batch would find the table
+            cursor.execute(f"DROP TABLE {staging}")
+        return imported
+
+    def _bulk_create_users(self, db, batch):
+        unique = {}
+        for email, name, password in batch:
+            unique.setdefault(email.lower(), (email, name, password))
+        existing = set(
+            self.using(db)
+            .annotate(email_lower=Lower("email"))
+            .filter(email_lower__in=unique)
+            .values_list("email_lower", flat=True)
+        )
+        now = timezone.now()
+        users = [
+            self.model(email=email, name=name, password=password, date_joined=now)
+            for key, (email, name, password) in unique.items()
+            if key not in existing
+        ]
+        return len(self.using(db).bulk_create(users, ignore_conflicts=True))
+
+    def filter_by_email(self, email):
+        """
+        Filters the users by email case-insensitively. The lookup compares
+        `lower(email)`, so it's served by the unique index on it.
+        """
+        return self.alias(email_lower=Lower("email")).filter(email_lower=email.lower())
+
     def get_by_natural_key(self, email):
-        return self.get(email__iexact=email)
+        return self.filter_by_email(email).get()
+
+    async def aget_by_natural_key(self, email):
+        return await self.filter_by_email(email).aget()
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -78,6 +194,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_verified = models.BooleanField("Email verified", default=False)
 
     date_joined = models.DateTimeField(_("Date joined"), default=timezone.now)
+    updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
 
     objects = UserManager()
 
@@ -88,6 +205,18 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = _("User")
         verbose_name_plural = _("Users")
         ordering = ["name", "-date_joined"]
+        constraints = [
+            models.UniqueConstraint(
+                Lower("email"),
+                name="accounts_user_email_ci_unique",
+                violation_error_message=_("This email address is already registered by another user."),
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of the user list
+            models.Index(fields=["date_joined", "id"], name="accounts_user_joined_id_idx"),
+            models.Index(fields=["name", "id"], name="accounts_user_name_id_idx"),
+        ]
 
     def get_first_name(self) -> str:
         """
@@ -137,6 +266,34 @@ class User(AbstractBaseUser, PermissionsMixin):
         m = hashlib.md5(self.email.lower().encode("utf-8")).hexdigest()
         return m
 
+    def set_password(self, raw_password):
+        """
+        Hashes the password in the password hashing pool.
+        """
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password) -> bool:
+        """
+        Checks the password in the password hashing pool. The hash is
+        upgraded to the preferred hasher (Argon2) after a successful check.
+        """
+        is_correct, new_password = hashing.verify_password(raw_password, self.password)
+        if new_password:
+            self.password = new_password
+            self.save(update_fields=["password"])
+        return is_correct
+
+    async def acheck_password(self, raw_password) -> bool:
+        """
+        Async version of `check_password()`, it doesn't block the event loop.
+        """
+        is_correct, new_password = await hashing.averify_password(raw_password, self.password)
+        if new_password:
+            self.password = new_password
+            await self.asave(update_fields=["password"])
+        return is_correct
+
     def has_usable_password(self) -> bool:
         """
         Checks if the user has a usable password.
@@ -0,0 +1,98 @@
+import time
+from functools import cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.settings import api_settings
+
+DEFAULT_REVOCATION_BACKEND = "accounts.revocation.CacheRevocationBackend"
+
+
+class BaseRevocationBackend:
+    """
+    Stores the identifiers (JTI) of the revoked refresh tokens.
+    """
+
+    def revoke(self, token):
+        raise NotImplementedError
+
+    def is_revoked(self, token):
+        raise NotImplementedError
+
+    def outstand(self, token):
+        """
+        Registers a newly issued token. Only the backends which keep track of
+        all the issued tokens need it.
+        """
+
+
+class CacheRevocationBackend(BaseRevocationBackend):
+    """
+    Keeps the revoked JTIs in the cache `SIMPLE_JWT["REVOCATION_CACHE_ALIAS"]`,
+    a Redis database which is never cleared nor evicted in production. Every
+    entry expires together with the token, so the store never grows beyond
+    the number of live revoked tokens.
+    """
+
+    key_template = "accounts:jwt:revoked:{jti}"
+
+    @property
+    def cache(self):
+        return caches[settings.SIMPLE_JWT.get("REVOCATION_CACHE_ALIAS", "default")]
+
+    def get_key(self, token):
+        return self.key_template.format(jti=token[api_settings.JTI_CLAIM])
+
+    def revoke(self, token):
+        timeout = token["exp"] - int(time.time())
+        if timeout > 0:
+            self.cache.set(self.get_key(token), 1, timeout)
+
+    def is_revoked(self, token):
+        return self.cache.get(self.get_key(token)) is not None
+
+
+class DatabaseRevocationBackend(BaseRevocationBackend):
+    """
+    The blacklist tables of `rest_framework_simplejwt.token_blacklist`.
+    """
+
+    def __init__(self):
+        if "rest_framework_simplejwt.token_blacklist" not in settings.INSTALLED_APPS:
+            raise ImproperlyConfigured(
+                "DatabaseRevocationBackend requires 'rest_framework_simplejwt.token_blacklist' in INSTALLED_APPS."
+            )
+
+    def revoke(self, token):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        RefreshToken.blacklist(token)
+
+    def is_revoked(self, token):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        return BlacklistedToken.objects.filter(token__jti=token[api_settings.JTI_CLAIM]).exists()
+
+    def outstand(self, token):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        RefreshToken.outstand(token)
+
+
+@cache
+def get_revocation_backend():
+    """
+    Returns the backend configured by `SIMPLE_JWT["REVOCATION_BACKEND"]`.
+    """
+    backend = settings.SIMPLE_JWT.get("REVOCATION_BACKEND", DEFAULT_REVOCATION_BACKEND)
+    return import_string(backend)()
+
+
+@receiver(setting_changed)
+def reset_revocation_backend(setting, **kwargs):
+    if setting == "SIMPLE_JWT":
+        get_revocation_backend.cache_clear()
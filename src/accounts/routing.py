@@ -0,0 +1,7 @@
+from django.urls import path
+
+from accounts import consumers
+
+websocket_urlpatterns = [
+    path("ws/account/", consumers.AccountEventsConsumer.as_asgi()),
+]
@@ -0,0 +1,45 @@
+"""
+User search served by the `pg_trgm` GIN indexes on PostgreSQL (see the
+0004 migration). The terms are matched with ILIKE, which the trigram
+indexes serve, and the results are ranked by the trigram similarity. The
+other databases (SQLite in tests) match with `icontains` and rank exact
+and prefix matches first.
+"""
+
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest, Lower
+
+SEARCH_FIELDS = ("email", "name")
+
+
+def search_users(queryset, term):
+    """
+    Filters the users whose email or name contains the term.
+    """
+    query = Q()
+    for field in SEARCH_FIELDS:
+        query |= Q(**{f"{field}__ilike": term})
+    return queryset.filter(query)
+
+
+def rank_users(queryset, term):
+    """
+    Returns the users matching the term, the best matches first. The rank
+    is available as the `rank` attribute.
+    """
+    queryset = search_users(queryset, term)
+    if connections[queryset.db].vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        rank = Greatest(*(TrigramSimilarity(field, term) for field in SEARCH_FIELDS))
+    else:
+        term = term.lower()
+        rank = Case(
+            *(When(**{f"{field}_lower": term}, then=Value(1.0)) for field in SEARCH_FIELDS),
+            *(When(**{f"{field}_lower__startswith": term}, then=Value(0.5)) for field in SEARCH_FIELDS),
+            default=Value(0.1),
+            output_field=FloatField(),
+        )
+        queryset = queryset.alias(**{f"{field}_lower": Lower(field) for field in SEARCH_FIELDS})
+    return queryset.annotate(rank=rank).order_by("-rank", "pk")
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.cache import invalidate_user_cache
+from accounts.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drops the cached user on every save (including `set_password()` followed
+    by `save()`) and delete. The entry is removed again on commit, so a
+    concurrent request can't put the old row back into the cache.
+    """
+    pk = instance.pk
+    invalidate_user_cache(pk)
+    transaction.on_commit(lambda: invalidate_user_cache(pk))
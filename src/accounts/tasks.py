@@ -1,21 +1,39 @@
 from celery import shared_task
-from django.conf import settings
-from django.core.mail import send_mail
 
+from accounts import bulk_actions
+from accounts.mail import deliver_outbox, queue_email
 from accounts.models import User
 
 
+@shared_task
+def flush_email_outbox():
+    return deliver_outbox()
+
+
 @shared_task
 def send_email(user_id, mail_subject, message):
-    try:
-        user = User.objects.get(pk=user_id)
+    """
+    Kept for the messages queued before the email outbox was introduced,
+    use `accounts.mail.queue_email()` instead.
+    """
+    email = User.objects.filter(pk=user_id).values_list("email", flat=True).first()
+    if email:
+        queue_email(mail_subject, message, [email])
+
 
-        send_mail(
-            mail_subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
-    except User.DoesNotExist:
-        pass
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def run_bulk_action(self, job_id):
+    """
+    Processes the next chunk of the admin bulk action job and queues the
+    following one. The retries continue after the last processed chunk,
+    the job fails (and can be resumed) once they are exhausted.
+    """
+    try:
+        more = bulk_actions.run_chunk(job_id)
+    except Exception as exc:
+        if self.request.retries >= self.max_retries:
+            bulk_actions.update_job(job_id, status=bulk_actions.FAILED, error=str(exc))
+            raise
+        raise self.retry(exc=exc)
+    if more:
+        run_bulk_action.delay(job_id)
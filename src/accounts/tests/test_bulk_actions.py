@@ -0,0 +1,125 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.redis import get_redis_connection
+
+from .. import bulk_actions
+from ..models import User
+from ..tasks import run_bulk_action
+
+
+# The Celery tasks run eagerly inside the admin requests, so the query
+# budget of the changelist can't apply
+@override_settings(ADMIN_BULK_ACTION_INLINE_LIMIT=3, ADMIN_BULK_ACTION_CHUNK_SIZE=2, QUERY_BUDGET_MODE="")
+class BulkActionTests(TestCase):
+    def setUp(self):
+        get_redis_connection().flushdb()
+        self.admin = User.objects.create_superuser("admin@mail.com", "Admin", "demo")
+        self.client.force_login(self.admin)
+        self.url = reverse("admin:accounts_user_changelist")
+
+    def create_users(self, count):
+        User.objects.bulk_create(
+            User(email=f"user{index}@mail.com", name=f"User {index}", password="!") for index in range(count)
+        )
+        return User.objects.exclude(pk=self.admin.pk)
+
+    def run_action(self, action, users):
+        return self.client.post(
+            self.url, {"action": action, "_selected_action": [user.pk for user in users]}, follow=True
+        )
+
+    def test_small_selection_is_applied_inline(self):
+        users = self.create_users(3)
+        with mock.patch("accounts.bulk_actions.start_job") as start_job:
+            self.run_action("deactivate", users)
+        start_job.assert_not_called()
+        self.assertFalse(users.filter(is_active=True).exists())
+
+    def test_large_selection_runs_in_chunks(self):
+        users = self.create_users(5)
+        with mock.patch("accounts.bulk_actions.apply_action", wraps=bulk_actions.apply_action) as apply_action:
+            response = self.run_action("deactivate", users)
+
+        self.assertEqual([len(call.args[1]) for call in apply_action.call_args_list], [2, 2, 1])
+        self.assertFalse(users.filter(is_active=True).exists())
+        self.assertTrue(User.objects.get(pk=self.admin.pk).is_active)
+        self.assertContains(response, "Deactivate: 5 of 5 users processed.")
+
+        # The finished job is reported once
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "users processed")
+
+    def test_job_stores_selected_pks(self):
+        users = self.create_users(5)
+        pks = sorted(users.values_list("pk", flat=True))
+        with mock.patch("accounts.tasks.run_bulk_action.delay"):
+            job_id = bulk_actions.start_job("deactivate", users, self.admin.pk)
+        redis = get_redis_connection()
+        pks_key = bulk_actions.JOB_PKS_KEY.format(id=job_id)
+        self.assertEqual([int(pk) for pk in redis.zrange(pks_key, 0, -1)], pks)
+        self.assertEqual(bulk_actions.get_job(job_id)["total"], 5)
+
+        # The users created after the selection are left alone
+        late = User.objects.create_user("late@mail.com", "Late User", "demo")
+        while bulk_actions.run_chunk(job_id):
+            pass
+        self.assertFalse(User.objects.filter(pk__in=pks, is_active=True).exists())
+        self.assertTrue(User.objects.get(pk=late.pk).is_active)
+        self.assertFalse(redis.exists(pks_key))
+
+    def test_unusable_password(self):
+        users = self.create_users(4)
+        User.objects.filter(pk__in=users).update(password="md5$salt$hash")
+        self.run_action("set_unusable_password", users)
+        self.assertFalse(any(user.has_usable_password() for user in users.all()))
+
+    def test_failed_job_is_resumed(self):
+        users = self.create_users(5)
+        # The first run and the 3 retries of the last chunk fail
+        failures = [ConnectionError("Lost connection")] * 4
+
+        def apply_action(action, pks):
+            if len(pks) == 1 and failures:
+                raise failures.pop()
+            User.objects.filter(pk__in=pks).update(is_active=False)
+
+        with mock.patch("accounts.bulk_actions.apply_action", side_effect=apply_action):
+            job_id = bulk_actions.start_job("deactivate", users, self.admin.pk)
+            self.assertEqual(users.filter(is_active=True).count(), 1)
+            response = self.client.get(self.url)
+            self.assertContains(response, "4 of 5 users processed. Lost connection")
+
+            response = self.client.get(reverse("admin:accounts_user_resume_bulk_job", args=(job_id,)), follow=True)
+        self.assertFalse(users.filter(is_active=True).exists())
+        self.assertEqual(bulk_actions.get_job(job_id)["processed"], 5)
+        self.assertContains(response, "Deactivate: 5 of 5 users processed.")
+
+    def test_retried_job_cannot_be_resumed(self):
+        users = self.create_users(5)
+        failures = [ConnectionError("Lost connection")]
+        retry = run_bulk_action.retry
+        resumed = []
+
+        def apply_action(action, pks):
+            if len(pks) == 1 and failures:
+                raise failures.pop()
+            User.objects.filter(pk__in=pks).update(is_active=False)
+
+        def retry_after_resume(**kwargs):
+            resumed.append(bulk_actions.resume_job(run_bulk_action.request.args[0]))
+            return retry(**kwargs)
+
+        with (
+            mock.patch("accounts.bulk_actions.apply_action", side_effect=apply_action),
+            mock.patch.object(run_bulk_action, "retry", side_effect=retry_after_resume) as mocked_retry,
+        ):
+            job_id = bulk_actions.start_job("deactivate", users, self.admin.pk)
+        mocked_retry.assert_called_once()
+        # The job can't be resumed while its retry is pending
+        self.assertEqual(resumed, [False])
+        self.assertFalse(users.filter(is_active=True).exists())
+        job = bulk_actions.get_job(job_id)
+        self.assertEqual((job["status"], job["processed"]), (bulk_actions.DONE, 5))
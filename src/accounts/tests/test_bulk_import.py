@@ -0,0 +1,45 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import User
+
+
+class BulkCreateUsersTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("existing@mail.com", "Existing User", "demo")
+
+    def test_bulk_create_users(self):
+        rows = [
+            {"email": "one@mail.com", "name": "One", "password": "secret"},
+            {"email": "two@mail.com", "name": "Two"},
+            {"email": "ONE@mail.com", "name": "One again"},
+            {"email": "Existing@mail.com", "name": "Duplicate"},
+            {"email": "", "name": "No email"},
+        ]
+        progress = []
+        imported = User.objects.bulk_create_users(rows, batch_size=2, progress=lambda *args: progress.append(args))
+
+        self.assertEqual(imported, 2)
+        self.assertEqual(progress, [(2, 2), (4, 2), (5, 2)])
+        self.assertEqual(User.objects.count(), 3)
+        self.assertTrue(User.objects.get(email="one@mail.com").check_password("secret"))
+        self.assertFalse(User.objects.get(email="two@mail.com").has_usable_password())
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write("email,name,password\nthree@mail.com,Three,secret\nfour@mail.com,Four,\n")
+            f.flush()
+            out = StringIO()
+            call_command("bulk_import_users", f.name, stdout=out)
+        self.assertIn("Imported 2 users", out.getvalue())
+        self.assertTrue(User.objects.get(email="three@mail.com").check_password("secret"))
+
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as f:
+            f.write(json.dumps({"email": "five@mail.com", "name": "Five"}) + "\n")
+            f.flush()
+            call_command("bulk_import_users", f.name, stdout=StringIO())
+        self.assertTrue(User.objects.filter(email="five@mail.com").exists())
@@ -0,0 +1,72 @@
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.events import PROFILE_UPDATED, SESSION_REVOKED, apublish_account_event, publish_account_event
+from accounts.models import User
+from config.asgi import application
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AccountEventsConsumerTests(TransactionTestCase):
+    # Not a TestCase: database_sync_to_async closes the old connections,
+    # including the one holding the test transaction
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("socket@mail.com", "Socket User", "demo")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def test_anonymous_is_rejected(self):
+        communicator = WebsocketCommunicator(application, "/ws/account/")
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_invalid_token_is_rejected(self):
+        communicator = WebsocketCommunicator(application, "/ws/account/?token=invalid")
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    def test_session_is_ignored(self):
+        # A third-party page opening the socket would send the cookie
+        self.client.force_login(self.user)
+        cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+        communicator = WebsocketCommunicator(
+            application, "/ws/account/", headers=[(b"cookie", cookie.encode()), (b"origin", b"https://evil.com")]
+        )
+        connected, code = async_to_sync(communicator.connect)()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_event_is_pushed(self):
+        communicator = WebsocketCommunicator(application, f"/ws/account/?token={self.token}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await apublish_account_event(self.user.pk, PROFILE_UPDATED, name="Renamed")
+        self.assertEqual(
+            await communicator.receive_json_from(), {"event": PROFILE_UPDATED, "data": {"name": "Renamed"}}
+        )
+
+        other = await User.objects.acreate_user("other@mail.com", "Other User", "demo")
+        await apublish_account_event(other.pk, PROFILE_UPDATED, name="Other")
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_header_authentication(self):
+        communicator = WebsocketCommunicator(
+            application, "/ws/account/", headers=[(b"authorization", f"Bearer {self.token}".encode())]
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+
+class PublishAccountEventTests(TestCase):
+    def test_published_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            publish_account_event(1, SESSION_REVOKED, jti="abc")
+        self.assertEqual(len(callbacks), 1)
@@ -0,0 +1,130 @@
+import csv
+import gzip
+import json
+import tracemalloc
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.query_budget import QueryBudgetExceeded
+
+from ..export import export_users
+from ..models import User
+
+
+def create_users(start, count):
+    User.objects.bulk_create(
+        (User(email=f"user{index}@mail.com", name=f"User {index}", password="!") for index in range(start, count)),
+        batch_size=1000,
+    )
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class UserExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("accounts_api:user-export")
+        self.staff = User.objects.create_user("staff@mail.com", "Staff Member", "demo")
+        User.objects.filter(pk=self.staff.pk).update(is_staff=True)
+        create_users(0, 3)
+
+    def get(self, user=None, **params):
+        access = RefreshToken.for_user(user or self.staff).access_token
+        headers = {"Authorization": f"Bearer {access}"}
+        if params.pop("gzip", False):
+            headers["Accept-Encoding"] = "gzip, deflate"
+        return self.client.get(self.url, params, headers=headers)
+
+    def test_csv(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(
+            [row["email"] for row in rows], ["staff@mail.com", "user0@mail.com", "user1@mail.com", "user2@mail.com"]
+        )
+        self.assertEqual(rows[0]["is_staff"], "True")
+
+    def test_csv_escapes_formulas(self):
+        User.objects.filter(email="user0@mail.com").update(name='=HYPERLINK("http://evil.com")')
+        User.objects.filter(email="user1@mail.com").update(name="-2+3")
+        rows = list(csv.DictReader(b"".join(self.get().streaming_content).decode().splitlines()))
+        names = {row["email"]: row["name"] for row in rows}
+        self.assertEqual(names["user0@mail.com"], '\'=HYPERLINK("http://evil.com")')
+        self.assertEqual(names["user1@mail.com"], "'-2+3")
+        self.assertEqual(names["user2@mail.com"], "User 2")
+
+        # The NDJSON isn't opened by spreadsheets, the values are kept
+        response = self.get(export_format="ndjson")
+        self.assertIn(b'"-2+3"', b"".join(response.streaming_content))
+
+    def test_ndjson(self):
+        response = self.get(export_format="ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1]["name"], "User 0")
+        self.assertIn("date_joined", rows[1])
+
+    def test_gzip(self):
+        response = self.get(gzip=True, export_format="ndjson")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        lines = gzip.decompress(b"".join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 4)
+
+    async def test_asgi_streams_async_iterator(self):
+        access = RefreshToken.for_user(self.staff).access_token
+        response = await self.async_client.get(
+            self.url, {"export_format": "ndjson"}, headers={"Authorization": f"Bearer {access}"}
+        )
+        self.assertTrue(response.is_async)
+        lines = [line async for chunk in response.streaming_content for line in chunk.splitlines()]
+        self.assertEqual(len(lines), 4)
+
+    def test_query_budget_counts_streamed_queries(self):
+        budgets = {"accounts_api:user-export": {"queries": 1}}
+        with self.settings(QUERY_BUDGETS=budgets):
+            response = self.get()
+            with self.assertRaisesMessage(QueryBudgetExceeded, "2 queries (budget 1)"):
+                b"".join(response.streaming_content)
+
+    def test_invalid_format(self):
+        self.assertEqual(self.get(export_format="xml").status_code, 400)
+
+    def test_staff_only(self):
+        self.assertEqual(self.get(User.objects.get(email="user0@mail.com")).status_code, 403)
+
+    def test_admin_action(self):
+        self.client.force_login(User.objects.create_superuser("admin@mail.com", "Admin", "demo"))
+        users = User.objects.filter(email__in=["user0@mail.com", "user1@mail.com"])
+        response = self.client.post(
+            reverse("admin:accounts_user_changelist"),
+            {"action": "export_csv", "_selected_action": [user.pk for user in users]},
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+
+@override_settings(ACCOUNTS_EXPORT_CHUNK_SIZE=500)
+class UserExportMemoryTests(TestCase):
+    def measure_peak(self):
+        request = RequestFactory().get("/", headers={"Accept-Encoding": "gzip"})
+        response = export_users(request, User.objects.all(), "csv")
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            return size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_does_not_grow_with_rows(self):
+        create_users(0, 2000)
+        small_size, small_peak = self.measure_peak()
+        create_users(2000, 10000)
+        large_size, large_peak = self.measure_peak()
+
+        self.assertGreater(large_size, small_size * 4)
+        self.assertLess(large_peak, small_peak * 1.5)
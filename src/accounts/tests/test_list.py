@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..models import User
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class UserListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("accounts_api:user-list")
+        self.staff = User.objects.create_user("staff@mail.com", "Staff Member", "demo")
+        User.objects.filter(pk=self.staff.pk).update(is_staff=True, date_joined=timezone.now() - timedelta(days=1))
+        # Several users share the date joined, so the ties are broken by the id
+        joined = timezone.now()
+        User.objects.bulk_create(
+            User(email=f"user{index}@mail.com", name=f"User {index}", password="!", date_joined=joined)
+            for index in range(5)
+        )
+        access = RefreshToken.for_user(self.staff).access_token
+        self.headers = {"Authorization": f"Bearer {access}"}
+
+    def get(self, url=None, **params):
+        return self.client.get(url or self.url, params, headers=self.headers)
+
+    def collect(self, **params):
+        emails = []
+        url = None
+        while True:
+            response = self.get(url, **params)
+            self.assertEqual(response.status_code, 200)
+            emails.extend(user["email"] for user in response.data["results"])
+            url = response.data["next"]
+            params = {}
+            if url is None:
+                return emails
+
+    def test_pages(self):
+        newest = list(User.objects.order_by("-date_joined", "-pk").values_list("email", flat=True))
+        self.assertEqual(self.collect(page_size=2), newest)
+        self.assertEqual(self.collect(page_size=2, ordering="date_joined"), newest[::-1])
+
+        by_name = list(User.objects.order_by("name", "pk").values_list("email", flat=True))
+        self.assertEqual(self.collect(page_size=4, ordering="name"), by_name)
+        self.assertEqual(self.collect(page_size=4, ordering="-name"), by_name[::-1])
+
+    def test_filters(self):
+        User.objects.filter(email="user0@mail.com").update(is_active=False)
+        self.assertEqual(len(self.get(is_active="false").data["results"]), 1)
+        self.assertEqual([user["email"] for user in self.get(is_staff="true").data["results"]], ["staff@mail.com"])
+        self.assertEqual(len(self.get(is_verified="0").data["results"]), 6)
+        self.assertEqual(self.get(is_staff="maybe").status_code, 400)
+
+    def test_page_cost_does_not_depend_on_position(self):
+        first = self.get(page_size=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.get(page_size=1)
+        with CaptureQueriesContext(connection) as later_queries:
+            self.get(first.data["next"])
+        self.assertEqual(len(later_queries), len(queries))
+        self.assertNotIn("OFFSET", later_queries[-1]["sql"])
+        self.assertNotIn("COUNT", later_queries[-1]["sql"])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.get(cursor="garbage").status_code, 404)
+
+    def test_staff_only(self):
+        user = User.objects.get(email="user0@mail.com")
+        access = RefreshToken.for_user(user).access_token
+        response = self.client.get(self.url, headers={"Authorization": f"Bearer {access}"})
+        self.assertEqual(response.status_code, 403)
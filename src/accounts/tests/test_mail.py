@@ -0,0 +1,145 @@
+import json
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.test import TestCase, override_settings
+
+from core.redis import get_redis_connection
+
+from ..mail import (
+    DELIVERY_LOCK_KEY,
+    OUTBOX_KEY,
+    PROCESSING_KEY,
+    RATE_LIMIT_KEY,
+    claim_batch,
+    deliver_outbox,
+    queue_email,
+)
+
+
+def get_outbox():
+    return [json.loads(item) for item in get_redis_connection().lrange(OUTBOX_KEY, 0, -1)]
+
+
+class CountingBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any(to.startswith("fail@") for message in messages for to in message.to):
+            raise ConnectionError("Rejected")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="accounts.tests.test_mail.CountingBackend")
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        get_redis_connection().flushdb()
+        CountingBackend.opened = 0
+        patcher = mock.patch("accounts.tasks.flush_email_outbox.apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_messages_are_sent_in_one_batch(self):
+        for i in range(3):
+            queue_email("Subject", "Message", [f"user{i}@mail.com"])
+        self.apply_async.assert_called_once()
+
+        self.assertEqual(deliver_outbox(), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(get_redis_connection().llen(OUTBOX_KEY), 0)
+
+    def test_only_failed_messages_are_retried(self):
+        queue_email("Subject", "Message", ["ok@mail.com"])
+        queue_email("Subject", "Message", ["fail@mail.com"])
+
+        with self.assertLogs("accounts.mail", "WARNING"), mock.patch("time.time", return_value=1000):
+            self.assertEqual(deliver_outbox(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            get_outbox(),
+            [{"subject": "Subject", "message": "Message", "to": ["fail@mail.com"], "attempts": 1, "not_before": 1060}],
+        )
+
+    @override_settings(EMAIL_RETRY_DELAY=60)
+    def test_failed_message_is_retried_with_backoff(self):
+        queue_email("Subject", "Message", ["fail@mail.com"])
+        self.apply_async.reset_mock()
+        with self.assertLogs("accounts.mail", "WARNING"), mock.patch("time.time", return_value=1000):
+            deliver_outbox()
+        # The next flush is scheduled when the message is due
+        self.assertEqual(self.apply_async.call_args.kwargs, {"countdown": 60})
+
+        # Skipped until it's due
+        with mock.patch("time.time", return_value=1059):
+            self.assertEqual(deliver_outbox(), 0)
+        self.assertEqual(get_outbox()[0]["attempts"], 1)
+
+        with self.assertLogs("accounts.mail", "WARNING"), mock.patch("time.time", return_value=1060):
+            deliver_outbox()
+        self.assertEqual((get_outbox()[0]["attempts"], get_outbox()[0]["not_before"]), (2, 1180))
+
+    @override_settings(EMAIL_MAX_ATTEMPTS=1)
+    def test_failed_message_is_dropped_after_max_attempts(self):
+        queue_email("Subject", "Message", ["fail@mail.com"])
+        with self.assertLogs("accounts.mail", "ERROR"):
+            self.assertEqual(deliver_outbox(), 0)
+        self.assertEqual(get_redis_connection().llen(OUTBOX_KEY), 0)
+
+    @override_settings(EMAIL_DOMAIN_RATE_LIMITS={"mail.com": 2})
+    def test_domain_rate_limit(self):
+        for i in range(3):
+            queue_email("Subject", "Message", [f"user{i}@mail.com"])
+        queue_email("Subject", "Message", ["user@example.com"])
+
+        with mock.patch("time.time", return_value=6000):
+            self.assertEqual(deliver_outbox(), 3)
+            self.assertEqual([item["to"] for item in get_outbox()], [["user2@mail.com"]])
+            # Deferred to the next minute, only the sent messages are counted
+            self.assertEqual(get_outbox()[0]["not_before"], 6060)
+            self.assertEqual(get_outbox()[0]["attempts"], 0)
+            self.assertEqual(deliver_outbox(), 0)
+            self.assertEqual(get_redis_connection().get(RATE_LIMIT_KEY.format(domain="mail.com", window=100)), b"2")
+
+        with mock.patch("time.time", return_value=6060):
+            self.assertEqual(deliver_outbox(), 1)
+        self.assertEqual(get_outbox(), [])
+
+    def test_batch_is_kept_when_connection_fails(self):
+        for i in range(3):
+            queue_email("Subject", "Message", [f"user{i}@mail.com"])
+
+        with mock.patch.object(CountingBackend, "open", side_effect=ConnectionRefusedError):
+            with self.assertRaises(ConnectionRefusedError):
+                deliver_outbox()
+        self.assertEqual([item["to"] for item in get_outbox()], [[f"user{i}@mail.com"] for i in range(3)])
+        self.assertEqual(get_redis_connection().llen(PROCESSING_KEY), 0)
+        self.assertFalse(get_redis_connection().exists(DELIVERY_LOCK_KEY))
+
+        self.assertEqual(deliver_outbox(), 3)
+        self.assertEqual(get_outbox(), [])
+
+    def test_batch_of_crashed_worker_is_delivered(self):
+        for i in range(3):
+            queue_email("Subject", "Message", [f"user{i}@mail.com"])
+        queue_email("Subject", "Message", ["late@mail.com"])
+        # A worker died after claiming the batch and sending nothing
+        claim_batch(3)
+
+        self.assertEqual(deliver_outbox(), 4)
+        self.assertEqual(
+            [message.to for message in mail.outbox], [[f"user{i}@mail.com"] for i in range(3)] + [["late@mail.com"]]
+        )
+        self.assertEqual(get_redis_connection().llen(PROCESSING_KEY), 0)
+
+    def test_concurrent_flush_is_skipped(self):
+        queue_email("Subject", "Message", ["user@mail.com"])
+        get_redis_connection().set(DELIVERY_LOCK_KEY, "other")
+
+        self.assertEqual(deliver_outbox(), 0)
+        self.assertEqual(len(get_outbox()), 1)
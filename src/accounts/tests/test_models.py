@@ -1,5 +1,10 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import MD5PasswordHasher, make_password
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
+from ..api.serializers import UserSerializer
+from ..forms import EditUserForm, UserCreationForm
 from ..models import User
 
 
@@ -36,3 +41,71 @@ class UserTests(TestCase):
         self.assertTrue(self.u1.has_usable_password())
         self.assertTrue(self.u2.has_usable_password())
         self.assertTrue(self.u3.has_usable_password())
+
+
+class EmailCaseTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("Demo@Mail.com", "John Doe", "demo")
+
+    def test_natural_key_ignores_case(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(User.objects.get_by_natural_key("DEMO@mail.com"), self.user)
+        self.assertIn("LOWER", queries[0]["sql"].upper())
+        self.assertNotIn("LIKE", queries[0]["sql"].upper())
+
+    async def test_async_natural_key_ignores_case(self):
+        self.assertEqual(await User.objects.aget_by_natural_key("demo@MAIL.com"), self.user)
+
+    def test_constraint(self):
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user("demo@mail.COM", "Jane Doe", "demo")
+
+    def test_forms(self):
+        form = UserCreationForm(
+            data={"email": "DEMO@mail.com", "name": "Jane", "password1": "s3cret-pass", "password2": "s3cret-pass"}
+        )
+        self.assertIn("email", form.errors)
+
+        other = User.objects.create_user("other@mail.com", "Jane Doe", "demo")
+        form = EditUserForm(data={"email": "demo@MAIL.com", "name": "Jane Doe"}, instance=other)
+        self.assertIn("email", form.errors)
+
+    def test_serializer(self):
+        serializer = UserSerializer(data={"email": "demo@MAIL.COM", "name": "Jane", "password": "s3cret-pass"})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors["email"], ["A user with this email already exists."])
+
+
+class PasswordHashingTests(TestCase):
+    def test_legacy_hash_is_upgraded_on_check(self):
+        with override_settings(
+            PASSWORD_HASHERS=[
+                "django.contrib.auth.hashers.MD5PasswordHasher",
+                "accounts.tests.test_models.LegacyHasher",
+            ]
+        ):
+            user = User.objects.create_user("legacy@mail.com", "Legacy User", None)
+            user.password = make_password("secret", hasher="legacy_md5")
+            user.save()
+
+            self.assertTrue(user.check_password("secret"))
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith("md5$"))
+            self.assertTrue(user.check_password("secret"))
+            self.assertFalse(user.check_password("wrong"))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_hashing_in_process_pool(self):
+        user = User.objects.create_user("pool@mail.com", "Pool User", "secret")
+        self.assertTrue(user.password.startswith("md5$"))
+        self.assertTrue(user.check_password("secret"))
+        self.assertFalse(user.check_password("wrong"))
+
+    def test_unusable_password(self):
+        user = User.objects.create_user("unusable@mail.com", "Unusable User", None)
+        self.assertFalse(user.has_usable_password())
+        self.assertFalse(user.check_password(""))
+
+
+class LegacyHasher(MD5PasswordHasher):
+    algorithm = "legacy_md5"
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..models import User
+from ..search import rank_users, search_users
+
+
+class UserSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            [
+                User(email="anna.smith@mail.com", name="Anna Smith", password="!"),
+                User(email="smith@mail.com", name="John Smith", password="!"),
+                User(email="bob@mail.com", name="Bob Smithers", password="!"),
+                User(email="carol@mail.com", name="Carol White", password="!"),
+            ]
+        )
+
+    def test_search(self):
+        users = search_users(User.objects.all(), "SMITH")
+        self.assertQuerySetEqual(
+            users.order_by("email"),
+            ["anna.smith@mail.com", "bob@mail.com", "smith@mail.com"],
+            transform=lambda user: user.email,
+        )
+
+    def test_ranking(self):
+        users = list(rank_users(User.objects.all(), "smith@mail.com"))
+        self.assertEqual([user.email for user in users], ["smith@mail.com", "anna.smith@mail.com"])
+        self.assertGreater(users[0].rank, users[1].rank)
+
+    def test_like_wildcards_are_escaped(self):
+        self.assertFalse(search_users(User.objects.all(), "%_").exists())
+
+    def test_admin_search(self):
+        self.client.force_login(User.objects.create_superuser("admin@mail.com", "Admin", "demo"))
+        response = self.client.get(reverse("admin:accounts_user_changelist"), {"q": "white"})
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class UserSearchAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("accounts_api:user-search")
+        self.staff = User.objects.create_user("staff@mail.com", "Staff Member", "demo")
+        User.objects.filter(pk=self.staff.pk).update(is_staff=True)
+        User.objects.create_user("searched@mail.com", "Searched User", "demo")
+
+    def get(self, user, **params):
+        access = RefreshToken.for_user(user).access_token
+        return self.client.get(self.url, params, headers={"Authorization": f"Bearer {access}"})
+
+    def test_search(self):
+        response = self.get(self.staff, q="searched")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user["email"] for user in response.json()], ["searched@mail.com"])
+        self.assertIn("rank", response.json()[0])
+
+    def test_limit(self):
+        response = self.get(self.staff, q="mail.com", limit=1)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_short_term(self):
+        self.assertEqual(self.get(self.staff, q="se").status_code, 400)
+
+    def test_staff_only(self):
+        user = User.objects.get(email="searched@mail.com")
+        self.assertEqual(self.get(user, q="searched").status_code, 403)
@@ -0,0 +1,26 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+from accounts.revocation import get_revocation_backend
+
+
+class RevocableRefreshToken(RefreshToken):
+    """
+    A refresh token which is revoked and checked through the configured
+    revocation backend instead of the blacklist tables.
+    """
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        Token.verify(self, *args, **kwargs)
+
+    def check_blacklist(self):
+        if get_revocation_backend().is_revoked(self):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        get_revocation_backend().revoke(self)
+
+    def outstand(self):
+        get_revocation_backend().outstand(self)
@@ -1,8 +1,13 @@
 from django.urls import include, path
 
-from .api import router as api_router
+from .api import async_router as async_api_router, router as api_router
 
 urlpatterns = [
+    # Include the async versions of the API under 'api/async/'
+    path(
+        "api/async/",
+        include((async_api_router.async_api_urlpatterns, "accounts_async_api"), namespace="accounts_async_api"),
+    ),
     # Include the API URLs under 'api/'
     path("api/", include((api_router.api_urlpatterns, "accounts_api"), namespace="accounts_api")),
 ]
@@ -0,0 +1,15 @@
+"""
+Performance benchmarks of the project.
+
+The benchmarks are regular Django test cases living in `bench_*.py`
+modules, so they are not collected by the default `manage.py test` run.
+Start them explicitly:
+
+    python manage.py test benchmarks --pattern="bench_*.py"
+
+Set `BENCHMARK_OUTPUT_DIR` to store the results as JSON files, and
+compare two of them with `python -m benchmarks.compare`. The load test of
+the whole account flow is run by `python -m benchmarks.loadtest`, and the
+throughput with and without the connection pooling (PostgreSQL only) by
+`python -m benchmarks.connections`.
+"""
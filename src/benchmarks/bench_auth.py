@@ -0,0 +1,27 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings, tag
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.api.authentication import CachedJWTAuthentication
+from accounts.models import User
+from benchmarks.utils import measure, report
+
+
+@tag("benchmark")
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class JWTAuthenticationBenchmark(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(email="bench@example.com", name="Bench User", password="benchpass123")
+        access = RefreshToken.for_user(user).access_token
+        self.request = RequestFactory().get("/api/profile/", HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_authenticate(self):
+        results = {}
+        for backend in (JWTAuthentication(), CachedJWTAuthentication()):
+            results[type(backend).__name__] = measure(lambda backend=backend: backend.authenticate(self.request))
+        report("jwt_authentication", results)
+
+        self.assertEqual(results["CachedJWTAuthentication"]["queries_per_call"], 0)
+        self.assertEqual(results["JWTAuthentication"]["queries_per_call"], 1)
@@ -0,0 +1,71 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.core.mail.backends import locmem
+from django.test import TestCase, override_settings, tag
+
+from accounts.mail import deliver_outbox, queue_email
+from benchmarks.utils import report
+from core.redis import get_redis_connection
+
+MESSAGES = 200
+# Approximate cost of a TCP + TLS + SMTP handshake with a remote server
+HANDSHAKE_SECONDS = 0.005
+
+
+class HandshakeBackend(locmem.EmailBackend):
+    """
+    A stand-in for the SMTP backend which pays the handshake cost every
+    time a connection is opened.
+    """
+
+    is_open = False
+
+    def open(self):
+        if self.is_open:
+            return False
+        time.sleep(HANDSHAKE_SECONDS)
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
+
+
+@tag("benchmark")
+@override_settings(EMAIL_BACKEND="benchmarks.bench_email.HandshakeBackend", EMAIL_BATCH_SIZE=MESSAGES)
+class EmailDeliveryBenchmark(TestCase):
+    def setUp(self):
+        get_redis_connection().flushdb()
+
+    def test_delivery_throughput(self):
+        start = time.perf_counter()
+        for i in range(MESSAGES):
+            send_mail("Subject", "Message", settings.DEFAULT_FROM_EMAIL, [f"user{i}@example.com"])
+        per_message = time.perf_counter() - start
+
+        with mock.patch("accounts.tasks.flush_email_outbox.apply_async"):
+            for i in range(MESSAGES):
+                queue_email("Subject", "Message", [f"user{i}@example.com"])
+            start = time.perf_counter()
+            sent = deliver_outbox()
+            batched = time.perf_counter() - start
+
+        self.assertEqual(sent, MESSAGES)
+        report(
+            "email_delivery",
+            {
+                "connection_per_message": {"messages": MESSAGES, "messages_per_second": round(MESSAGES / per_message)},
+                "batched_outbox": {"messages": MESSAGES, "messages_per_second": round(MESSAGES / batched)},
+            },
+        )
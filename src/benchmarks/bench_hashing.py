@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, override_settings, tag
+
+from accounts import hashing
+from benchmarks.utils import report
+
+PBKDF2 = "django.contrib.auth.hashers.PBKDF2PasswordHasher"
+ARGON2 = "django.contrib.auth.hashers.Argon2PasswordHasher"
+
+LOGINS = int(os.environ.get("BENCHMARK_LOGINS", 16))
+CONCURRENCY = int(os.environ.get("BENCHMARK_CONCURRENCY", 8))
+
+
+@tag("benchmark")
+class PasswordHashingBenchmark(SimpleTestCase):
+    """
+    Login throughput (one password check per login) of the legacy PBKDF2
+    hasher checked on the request thread and of Argon2 checked in the
+    hashing pool. The per core figure is divided by the number of
+    processes which were hashing.
+    """
+
+    def run_logins(self, hasher, workers):
+        with override_settings(PASSWORD_HASHERS=[hasher], PASSWORD_HASHING_WORKERS=workers):
+            encoded = make_password("benchpass123")
+            # Start the pool before measuring
+            hashing.verify_password("benchpass123", encoded)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(CONCURRENCY) as executor:
+                results = list(executor.map(lambda _: hashing.verify_password("benchpass123", encoded), range(LOGINS)))
+            elapsed = time.perf_counter() - start
+
+        self.assertTrue(all(is_correct for is_correct, _ in results))
+        cores = min(workers or CONCURRENCY, os.cpu_count())
+        return {
+            "logins": LOGINS,
+            "concurrency": CONCURRENCY,
+            "logins_per_second": round(LOGINS / elapsed, 1),
+            "logins_per_second_per_core": round(LOGINS / elapsed / cores, 1),
+        }
+
+    def test_login_throughput(self):
+        workers = min(os.cpu_count(), 4)
+        report(
+            "password_hashing",
+            {
+                "pbkdf2_inline": self.run_logins(PBKDF2, 0),
+                "argon2_inline": self.run_logins(ARGON2, 0),
+                f"argon2_pool_{workers}": self.run_logins(ARGON2, workers),
+            },
+        )
@@ -0,0 +1,49 @@
+from io import BytesIO
+
+from django.test import TestCase, tag
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from accounts.api.serializers import UserListSerializer
+from accounts.export import EXPORT_FIELDS, iter_ndjson
+from accounts.models import User
+from benchmarks.utils import measure, report
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+USERS = 10000
+PAGE_SIZE = 50
+
+
+@tag("benchmark")
+class JSONBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(email=f"user{index}@example.com", name=f"User {index}", password="!") for index in range(USERS)
+        )
+
+    def setUp(self):
+        users = UserListSerializer(User.objects.order_by("-date_joined", "-pk"), many=True).data
+        self.page = {"next": "http://testserver/api/users/?cursor=WyIyMDI0LTAxLTAxIiwxXQ", "results": users[:PAGE_SIZE]}
+        self.payload = users
+        self.rows = list(User.objects.values_list(*EXPORT_FIELDS))
+        self.body = JSONRenderer().render(self.payload)
+
+    def test_json(self):
+        json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+        json_parser, orjson_parser = JSONParser(), ORJSONParser()
+        results = {
+            "render_page_json": measure(lambda: json_renderer.render(self.page)),
+            "render_page_orjson": measure(lambda: orjson_renderer.render(self.page)),
+            f"render_{USERS}_json": measure(lambda: json_renderer.render(self.payload), iterations=20),
+            f"render_{USERS}_orjson": measure(lambda: orjson_renderer.render(self.payload), iterations=20),
+            f"ndjson_{USERS}": measure(lambda: sum(1 for _ in iter_ndjson(self.rows)), iterations=20),
+            f"parse_{USERS}_json": measure(lambda: json_parser.parse(BytesIO(self.body)), iterations=20),
+            f"parse_{USERS}_orjson": measure(lambda: orjson_parser.parse(BytesIO(self.body)), iterations=20),
+        }
+        report("json", results)
+
+        self.assertEqual(orjson_renderer.render(self.payload), self.body)
+        self.assertLess(results[f"render_{USERS}_orjson"]["mean_us"], results[f"render_{USERS}_json"]["mean_us"])
+        self.assertLess(results[f"parse_{USERS}_orjson"]["mean_us"], results[f"parse_{USERS}_json"]["mean_us"])
@@ -0,0 +1,31 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, tag
+from django.urls import resolve
+
+from benchmarks.utils import measure, report
+from core.metrics import metrics_middleware
+
+
+@tag("benchmark")
+class MetricsMiddlewareBenchmark(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/api/profile/")
+        self.request.resolver_match = resolve("/api/profile/")
+        self.response = HttpResponse(b"{}", content_type="application/json")
+
+    def get_response(self, request):
+        return self.response
+
+    def test_overhead(self):
+        middleware = metrics_middleware(self.get_response)
+        results = {
+            "without_middleware": measure(lambda: self.get_response(self.request)),
+            "with_middleware": measure(lambda: middleware(self.request)),
+        }
+        results["overhead"] = {
+            "mean_us": round(results["with_middleware"]["mean_us"] - results["without_middleware"]["mean_us"], 2)
+        }
+        report("metrics_middleware", results)
+
+        # The instrumentation must stay in the microsecond range
+        self.assertLess(results["overhead"]["mean_us"], 100)
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, tag
+
+from benchmarks.utils import measure, report
+from core.middleware import MiddlewareChain, PathMiddleware
+
+
+def view(request):
+    return HttpResponse(b"{}", content_type="application/json")
+
+
+@tag("benchmark")
+class PathMiddlewareBenchmark(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.response = view(None)
+
+    def get_response(self, request):
+        return self.response
+
+    def run_middleware(self, middleware, path):
+        # Called like by the handler: the middlewares, then the view hooks
+        request = self.factory.get(path, headers={"Cookie": "sessionid=missing"})
+        middleware(request)
+        middleware.process_view(request, view, (), {})
+
+    def test_overhead(self):
+        # The full browser stack, which every request ran before
+        full = MiddlewareChain(settings.PATH_MIDDLEWARE["/"], self.get_response)
+        dispatcher = PathMiddleware(self.get_response)
+        results = {
+            "api_full_stack": measure(lambda: self.run_middleware(full, "/api/profile/")),
+            "api_dispatched": measure(lambda: self.run_middleware(dispatcher, "/api/profile/")),
+            "browser_dispatched": measure(lambda: self.run_middleware(dispatcher, "/superadmin/")),
+        }
+        report("path_middleware", results)
+
+        self.assertLess(results["api_dispatched"]["mean_us"], results["api_full_stack"]["mean_us"])
@@ -0,0 +1,41 @@
+import os
+
+from django.db.models import Q
+from django.test import TestCase, tag
+
+from accounts.models import User
+from accounts.search import rank_users, search_users
+from benchmarks.utils import measure, report
+
+USERS = int(os.environ.get("BENCHMARK_SEARCH_USERS", 50000))
+
+
+@tag("benchmark")
+class UserSearchBenchmark(TestCase):
+    """
+    Compares the admin's default `icontains` search with the trigram search.
+    The indexes are only used on PostgreSQL (BENCH_DATABASE=postgres), on
+    SQLite both of them scan the table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            (
+                User(email=f"user{index}@example{index % 97}.com", name=f"User {index:x}", password="!")
+                for index in range(USERS)
+            ),
+            batch_size=5000,
+        )
+
+    def test_search(self):
+        term = "r4a2@example3"
+        queryset = User.objects.all()
+        results = {
+            "icontains": measure(
+                lambda: list(queryset.filter(Q(email__icontains=term) | Q(name__icontains=term))[:20]), iterations=50
+            ),
+            "trigram": measure(lambda: list(search_users(queryset, term)[:20]), iterations=50),
+            "trigram_ranked": measure(lambda: list(rank_users(queryset, term)[:20]), iterations=50),
+        }
+        report("user_search", results)
@@ -0,0 +1,82 @@
+from django.test import TestCase, tag
+from rest_framework import serializers
+
+from accounts.api.serializers import UserListSerializer, UserProfileSerializer, UserSerializer
+from accounts.models import User
+from benchmarks.utils import measure, report
+
+USERS = 1000
+COMPILED_USERS = 10000
+
+
+class ModelUserListSerializer(serializers.ModelSerializer):
+    # UserListSerializer without the compiled plan
+    Meta = UserListSerializer.Meta
+
+
+@tag("benchmark")
+class SerializerBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(email=f"user{index}@example.com", name=f"User {index}", password="!") for index in range(USERS)
+        )
+
+    def setUp(self):
+        self.users = list(User.objects.all())
+        self.user = self.users[0]
+
+    def test_serialize(self):
+        results = {
+            "user": measure(lambda: UserSerializer(self.user).data),
+            "profile": measure(lambda: UserProfileSerializer(self.user).data),
+            f"user_list_{USERS}": measure(lambda: UserSerializer(self.users, many=True).data, iterations=20),
+            "register_validation": measure(
+                lambda: UserSerializer(
+                    data={"email": "new@example.com", "name": "New User", "password": "benchpass123"}
+                ).is_valid(raise_exception=True)
+            ),
+        }
+        report("serializers", results)
+
+        self.assertEqual(results["user"]["queries_per_call"], 0)
+        self.assertEqual(results[f"user_list_{USERS}"]["queries_per_call"], 0)
+
+
+@tag("benchmark")
+class CompiledSerializerBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(email=f"user{index}@example.com", name=f"User {index}", password="!")
+            for index in range(COMPILED_USERS)
+        )
+
+    def setUp(self):
+        self.users = list(User.objects.all())
+        self.rows = list(User.objects.values(*UserListSerializer.get_value_fields()))
+        self.user = self.users[0]
+
+    def test_serialize(self):
+        results = {
+            "user_model_serializer": measure(lambda: ModelUserListSerializer(self.user).data),
+            "user_compiled": measure(lambda: UserListSerializer(self.user).data),
+            f"users_{COMPILED_USERS}_model_serializer": measure(
+                lambda: ModelUserListSerializer(self.users, many=True).data, iterations=10
+            ),
+            f"users_{COMPILED_USERS}_compiled": measure(
+                lambda: UserListSerializer(self.users, many=True).data, iterations=10
+            ),
+            f"rows_{COMPILED_USERS}_compiled": measure(
+                lambda: UserListSerializer(self.rows, many=True).data, iterations=10
+            ),
+        }
+        report("compiled_serializers", results)
+
+        self.assertEqual(
+            UserListSerializer(self.rows, many=True).data, ModelUserListSerializer(self.users, many=True).data
+        )
+        self.assertLess(
+            results[f"users_{COMPILED_USERS}_compiled"]["mean_us"],
+            results[f"users_{COMPILED_USERS}_model_serializer"]["mean_us"],
+        )
@@ -0,0 +1,41 @@
+"""
+Compares two benchmark results stored as JSON by `benchmarks.utils.report`,
+e.g. the load test of two commits:
+
+    python -m benchmarks.compare before/loadtest.json after/loadtest.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def compare(before, after):
+    """
+    Yields the variant, the metric, both values and the relative change of
+    every numeric metric present in both results.
+    """
+    for variant, values in after.items():
+        for metric, value in values.items():
+            old = before.get(variant, {}).get(metric)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)):
+                change = (value - old) / old * 100 if old else None
+                yield variant, metric, old, value, change
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    args = parser.parse_args()
+
+    before = json.loads(args.before.read_text())
+    after = json.loads(args.after.read_text())
+    for variant, metric, old, new, change in compare(before, after):
+        change = f"{change:+.1f}%" if change is not None else "-"
+        sys.stdout.write(f"{variant:>12} {metric:>20}: {old:>12} -> {new:>12} ({change})\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Throughput of the API with the different ways of reusing the PostgreSQL
+connections: a new connection per request, persistent connections and a
+connection pool.
+
+    python -m benchmarks.connections --workers 4 --concurrency 20 --duration 20
+
+A gunicorn server is started for every mode against the PostgreSQL and
+Redis configured in the environment (as for `manage.py`), the mode is set
+by the `POSTGRES_*` variables of the server process. Every client lists
+the users as a throw-away staff user with its own HTTP session, a page
+which is queried on every request (unlike the cached profile), and the
+requests per second are stored as `BENCHMARK_OUTPUT_DIR/connections.json`.
+"""
+
+import argparse
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.servers import start_server
+
+MODES = {
+    "new_connection": {"POSTGRES_POOL": "0", "POSTGRES_CONN_MAX_AGE": "0"},
+    "persistent": {"POSTGRES_POOL": "0", "POSTGRES_CONN_MAX_AGE": "60", "POSTGRES_CONN_HEALTH_CHECKS": "1"},
+    "pool": {"POSTGRES_POOL": "1"},
+}
+
+
+def run_client(url, token, deadline):
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    samples = []
+    errors = 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            ok = session.get(url).status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            samples.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    return samples, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Number of gunicorn workers.")
+    parser.add_argument("--concurrency", type=int, default=20, help="Number of clients.")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from decouple import config
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", config("DJANGO_SETTINGS_MODULE", default="config.settings.dev"))
+    import django
+
+    django.setup()
+
+    from django.db import connection
+
+    from accounts.models import User
+    from accounts.tokens import RevocableRefreshToken
+    from benchmarks.utils import report, summarize
+
+    if connection.vendor != "postgresql":
+        parser.error("The benchmark needs PostgreSQL, the connections to SQLite cost nothing")
+
+    user = User.objects.create_user(f"bench-{uuid.uuid4().hex}@example.com", "Bench User", None, is_verified=True)
+    User.objects.filter(pk=user.pk).update(is_staff=True)
+    token = str(RevocableRefreshToken.for_user(user).access_token)
+    url = f"http://127.0.0.1:{args.port}/api/users/"
+    results = {}
+    try:
+        for name, env in MODES.items():
+            os.environ.update(env)
+            process = start_server("config.wsgi", [], args.port, args.workers)
+            try:
+                deadline = time.monotonic() + args.duration
+                with ThreadPoolExecutor(args.concurrency) as executor:
+                    runs = list(executor.map(lambda _: run_client(url, token, deadline), range(args.concurrency)))
+            finally:
+                process.terminate()
+                process.wait()
+            samples = [sample for run_samples, _ in runs for sample in run_samples]
+            results[name] = {
+                **(summarize(samples) if samples else {}),
+                "errors": sum(errors for _, errors in runs),
+                "requests_per_second": round(len(samples) / args.duration, 1),
+            }
+    finally:
+        user.delete()
+
+    report("connections", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Load test of the account API. Every virtual user goes through the
+register -> activate -> login -> refresh -> profile -> logout flow against
+a locally started gunicorn server.
+
+    python -m benchmarks.loadtest --users 500 --concurrency 20 --workers 4
+
+The server and the load test use `config.settings.bench`, so by default
+they run offline with SQLite and fakeredis (see the settings module for
+using PostgreSQL and Redis). The latency percentiles, the throughput and
+the number of database queries per request (read from the Server-Timing
+header) are reported for every step and stored as
+`BENCHMARK_OUTPUT_DIR/loadtest.json` together with the current commit.
+Compare two runs with `python -m benchmarks.compare`.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.servers import start_server
+
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+EXPECTED_STATUS = {
+    "register": 201,
+    "activate": 200,
+    "login": 200,
+    "refresh": 200,
+    "profile": 200,
+    "logout": 204,
+}
+
+
+class VirtualUser:
+    password = "loadtest-password"
+
+    def __init__(self, base_url, email, samples):
+        self.base_url = base_url
+        self.email = email
+        self.samples = samples
+        self.session = requests.Session()
+
+    def call(self, step, method, path, **kwargs):
+        start = time.perf_counter()
+        response = self.session.request(method, self.base_url + path, **kwargs)
+        elapsed = time.perf_counter() - start
+        match = QUERIES_PATTERN.search(response.headers.get("Server-Timing", ""))
+        ok = response.status_code == EXPECTED_STATUS[step]
+        self.samples[step].append((elapsed, ok, int(match.group(1)) if match else None))
+        if not ok:
+            raise RuntimeError(f"{step} failed with {response.status_code}")
+        return response
+
+    def run(self):
+        from django.utils.encoding import force_bytes
+        from django.utils.http import urlsafe_base64_encode
+
+        from accounts.models import User
+        from accounts.utils import account_activation_token
+
+        response = self.call(
+            "register", "POST", "/api/register/", json={"email": self.email, "name": "Load", "password": self.password}
+        )
+        user = User.objects.get(pk=response.json()["user"]["id"])
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        self.call("activate", "GET", f"/api/activate/{uid}/{account_activation_token.make_token(user)}/")
+
+        tokens = self.call("login", "POST", "/api/login/", json={"email": self.email, "password": self.password}).json()
+        tokens.update(self.call("refresh", "POST", "/api/token/refresh/", json={"refresh": tokens["refresh"]}).json())
+        auth = {"Authorization": f"Bearer {tokens['access']}"}
+        self.call("profile", "GET", "/api/profile/", headers=auth)
+        self.call("logout", "POST", "/api/logout/", json={"refresh": tokens["refresh"]}, headers=auth)
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_database():
+    from django.conf import settings
+    from django.core.management import call_command
+
+    database = settings.DATABASES["default"]
+    if database["ENGINE"] == "django.db.backends.sqlite3" and os.path.exists(database["NAME"]):
+        os.remove(database["NAME"])
+    call_command("migrate", verbosity=0)
+
+
+def summarize_steps(samples, duration):
+    from benchmarks.utils import summarize
+
+    results = {}
+    for step in EXPECTED_STATUS:
+        step_samples = samples[step]
+        latencies = [elapsed for elapsed, ok, _ in step_samples if ok]
+        queries = [count for _, ok, count in step_samples if ok and count is not None]
+        results[step] = {
+            **(summarize(latencies) if latencies else {}),
+            "errors": sum(not ok for _, ok, _ in step_samples),
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    total = sum(len(step_samples) for step_samples in samples.values())
+    results["total"] = {"requests": total, "requests_per_second": round(total / duration, 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="Number of virtual users.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of users running at the same time.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of gunicorn workers.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--settings", default="config.settings.bench")
+    args = parser.parse_args()
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = args.settings
+    import django
+
+    django.setup()
+
+    from benchmarks.utils import report
+
+    prepare_database()
+    process = start_server("config.wsgi", [], args.port, args.workers)
+    samples = defaultdict(list)
+    run_id = uuid.uuid4().hex[:8]
+    errors = []
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            users = [
+                VirtualUser(f"http://127.0.0.1:{args.port}", f"load-{run_id}-{index}@example.com", samples)
+                for index in range(args.users)
+            ]
+            for future in [executor.submit(user.run) for user in users]:
+                if exception := future.exception():
+                    errors.append(exception)
+        duration = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+
+    results = summarize_steps(samples, duration)
+    results["run"] = {
+        "commit": get_commit(),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "failed_users": len(errors),
+    }
+    report("loadtest", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Side-by-side benchmark of the sync API served by gunicorn sync workers and
+the async API served by uvicorn workers, under many slow clients.
+
+    python -m benchmarks.servers --workers 4 --clients 200 --duration 20
+
+Both servers are started against the database and Redis configured in the
+environment (as for `manage.py`). A throw-away verified user is created for
+the run, and every client requests the user's profile while trickling the
+request bytes over `--client-delay` seconds, like a client on a slow network.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+SERVERS = {
+    "sync_gunicorn": ("config.wsgi", [], "/api/profile/"),
+    "async_uvicorn": ("config.asgi", ["-k", "uvicorn.workers.UvicornWorker"], "/api/async/profile/"),
+}
+
+
+def start_server(app, options, port, workers):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", app, "--bind", f"127.0.0.1:{port}", "--workers", str(workers), *options],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{app} did not start on port {port}")
+
+
+async def slow_request(port, path, token, delay):
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\nConnection: close\r\n\r\n"
+    ).encode()
+    chunks = [request[i : i + 16] for i in range(0, len(request), 16)]
+
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            await writer.drain()
+            await asyncio.sleep(delay / len(chunks))
+        response = await reader.read()
+    finally:
+        writer.close()
+    return response.startswith(b"HTTP/1.1 200"), time.perf_counter() - start
+
+
+async def run_clients(port, path, token, clients, duration, delay):
+    samples = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            try:
+                ok, elapsed = await slow_request(port, path, token, delay)
+            except OSError:
+                ok, elapsed = False, 0
+            if ok:
+                samples.append(elapsed)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return samples, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--client-delay", type=float, default=0.5, help="Seconds to send one request.")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from decouple import config
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", config("DJANGO_SETTINGS_MODULE", default="config.settings.dev"))
+    import django
+
+    django.setup()
+
+    from accounts.models import User
+    from accounts.tokens import RevocableRefreshToken
+    from benchmarks.utils import report, summarize
+
+    user = User.objects.create_user(f"bench-{uuid.uuid4().hex}@example.com", "Bench User", None, is_verified=True)
+    token = str(RevocableRefreshToken.for_user(user).access_token)
+    results = {}
+    try:
+        for name, (app, options, path) in SERVERS.items():
+            # As the entrypoint sets it for the uvicorn workers
+            os.environ["ASGI"] = "1" if app == "config.asgi" else "0"
+            process = start_server(app, options, args.port, args.workers)
+            try:
+                samples, errors = asyncio.run(
+                    run_clients(args.port, path, token, args.clients, args.duration, args.client_delay)
+                )
+            finally:
+                process.terminate()
+                process.wait()
+            results[name] = {
+                **(summarize(samples) if samples else {}),
+                "errors": errors,
+                "requests_per_second": round(len(samples) / args.duration, 1),
+            }
+    finally:
+        user.delete()
+
+    report("servers", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+ITERATIONS = int(os.environ.get("BENCHMARK_ITERATIONS", 1000))
+
+
+def summarize(samples):
+    """
+    Returns the latency statistics (in microseconds) of the given samples
+    measured in seconds.
+    """
+    samples = sorted(samples)
+    count = len(samples)
+    total = sum(samples)
+    return {
+        "iterations": count,
+        "mean_us": round(statistics.fmean(samples) * 1e6, 2),
+        "p50_us": round(samples[int(count * 0.50)] * 1e6, 2),
+        "p95_us": round(samples[min(int(count * 0.95), count - 1)] * 1e6, 2),
+        "p99_us": round(samples[min(int(count * 0.99), count - 1)] * 1e6, 2),
+        "per_second": round(count / total, 1) if total else None,
+    }
+
+
+def measure(func, iterations=ITERATIONS, warmup=10):
+    """
+    Calls `func` the given number of times and returns the latency
+    statistics together with the number of queries per call.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+
+    results = summarize(samples)
+    results["queries_per_call"] = round(len(queries) / iterations, 2)
+    return results
+
+
+def report(name, results):
+    """
+    Writes the results of the benchmark to stdout and stores them as JSON in
+    `BENCHMARK_OUTPUT_DIR` if the variable is set.
+    """
+    sys.stdout.write(f"\n{name}\n")
+    for variant, values in results.items():
+        line = ", ".join(f"{key}={value}" for key, value in values.items())
+        sys.stdout.write(f"  {variant}: {line}\n")
+
+    output_dir = os.environ.get("BENCHMARK_OUTPUT_DIR")
+    if output_dir:
+        path = Path(output_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / f"{name}.json").write_text(json.dumps(results, indent=2))
@@ -1,18 +1,25 @@
 import os
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.prod')
 
 django_asgi_app = get_asgi_application()
+
+# The consumers import the models, so the routes are loaded after Django is set up
+from accounts.middleware import JWTAuthMiddleware  # noqa: E402
+from accounts.routing import websocket_urlpatterns as accounts_websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
-    'websocket': AuthMiddlewareStack(
+    # Only the JWT authenticates the sockets: a session cookie would be sent
+    # by any site opening a socket in the user's browser
+    'websocket': JWTAuthMiddleware(
         URLRouter(
             [
                 # Add the consumers here
+                *accounts_websocket_urlpatterns,
             ]
         )
     ),
@@ -1,3 +1,4 @@
+import copy
 import os
 import sys
 from pathlib import Path
@@ -5,7 +6,7 @@ from pathlib import Path
 from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
+BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 PROJECT_NAME = config("PROJECT_NAME", default="NEWPROJECTNAME")
 
 
@@ -43,9 +44,11 @@ INSTALLED_APPS = [
     "corsheaders",
     # 'polymorphic',
     # 'anymail',
+    # Before django_extensions, whose clear_cache command would shadow the
+    # core one
+    "core",
     "django_extensions",
     # Add the apps here
-    "core",
     "accounts",
 ]
 
@@ -73,16 +76,32 @@ if SENTRY_DSN:
 
 
 MIDDLEWARE = [
+    "core.metrics.metrics_middleware",
+    "core.query_budget.query_budget_middleware",
+    "core.replicas.replica_middleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.locale.LocaleMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
+    "core.middleware.PathMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+# The middlewares run by core.middleware.PathMiddleware for the longest
+# matching path prefix. The API is authenticated by the JWT, so it skips the
+# session, locale, CSRF and messages middlewares.
+PATH_MIDDLEWARE = {
+    "/api/": [
+        "django.middleware.common.CommonMiddleware",
+    ],
+    "/": [
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.middleware.locale.LocaleMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+    ],
+}
+# The admin checks only look for its middlewares in MIDDLEWARE
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
 
 ROOT_URLCONF = "config.urls"
 
@@ -104,6 +123,17 @@ TEMPLATES = [
     },
 ]
 
+# The connections are reused either as persistent connections, checked
+# before the reuse, or through a psycopg connection pool (POSTGRES_POOL=1)
+# of every worker process. Set POSTGRES_PGBOUNCER=1 when connecting through
+# PgBouncer in the transaction pooling mode.
+POSTGRES_POOL = config("POSTGRES_POOL", default=False, cast=bool)
+# Served by uvicorn workers (see docker/django/entrypoint). Every async
+# request runs its sync code in its own thread, whose persistent connection
+# would be left open, so the connections aren't persistent under ASGI.
+ASGI = config("ASGI", default=False, cast=bool)
+POSTGRES_PGBOUNCER = config("POSTGRES_PGBOUNCER", default=False, cast=bool)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -112,12 +142,58 @@ DATABASES = {
         "NAME": config("POSTGRES_DB"),
         "USER": config("POSTGRES_USER", default="postgres"),
         "PASSWORD": config("POSTGRES_PASSWORD"),
+        # The pool replaces the persistent connections
+        "CONN_MAX_AGE": 0 if POSTGRES_POOL or ASGI else config("POSTGRES_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": config("POSTGRES_CONN_HEALTH_CHECKS", default=True, cast=bool),
+        # The server-side cursors don't survive the end of the transaction
+        # when PgBouncer hands the server connection to another client
+        "DISABLE_SERVER_SIDE_CURSORS": POSTGRES_PGBOUNCER,
+        "OPTIONS": {},
     },
 }
+if POSTGRES_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": config("POSTGRES_POOL_MIN_SIZE", default=2, cast=int),
+        "max_size": config("POSTGRES_POOL_MAX_SIZE", default=10, cast=int),
+        "timeout": config("POSTGRES_POOL_TIMEOUT", default=10, cast=float),
+    }
+if POSTGRES_PGBOUNCER:
+    # Neither can the prepared statements
+    DATABASES["default"]["OPTIONS"]["prepare_threshold"] = None
+
+# Read replicas, e.g. POSTGRES_REPLICAS=replica1:5432,replica2:5432, which
+# get the safe requests' reads (see core.replicas)
+REPLICA_DATABASES = []
+for index, address in enumerate(config("POSTGRES_REPLICAS", default="", cast=Csv()), start=1):
+    host, _, port = address.partition(":")
+    REPLICA_DATABASES.append(f"replica_{index}")
+    DATABASES[f"replica_{index}"] = {
+        **copy.deepcopy(DATABASES["default"]),
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+# Seconds the reads of a user stay on the primary after a write
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=10, cast=int)
+# Seconds of the replication lag above which a replica isn't used
+REPLICA_MAX_LAG = config("REPLICA_MAX_LAG", default=5, cast=float)
+REPLICA_LAG_CHECK_INTERVAL = config("REPLICA_LAG_CHECK_INTERVAL", default=5, cast=float)
 
 AUTH_USER_MODEL = "accounts.User"
 AUTH_PASSWORD_VALIDATORS = []
 
+# Argon2 is the preferred hasher, hashes made by the other ones are
+# upgraded on the next successful login.
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# Size of the process pool used for password hashing, 0 hashes inline
+PASSWORD_HASHING_WORKERS = config("PASSWORD_HASHING_WORKERS", default=2, cast=int)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -137,9 +213,28 @@ USE_L10N = True
 USE_TZ = True
 
 REDIS_URL = config("REDIS_URL")
+# The roles can use separate Redis databases or servers, so that clearing
+# the cache or evicting its keys never touches the Celery queues
+REDIS_CACHE_URL = config("REDIS_CACHE_URL", default=REDIS_URL)
+REDIS_BROKER_URL = config("REDIS_BROKER_URL", default=REDIS_URL)
+REDIS_RESULT_URL = config("REDIS_RESULT_URL", default=REDIS_BROKER_URL)
+REDIS_CHANNELS_URL = config("REDIS_CHANNELS_URL", default=REDIS_URL)
+# The revoked refresh tokens must never be evicted nor cleared with the
+# cache, keep them in a database of a server with maxmemory-policy noeviction
+REDIS_REVOCATION_URL = config("REDIS_REVOCATION_URL", default=REDIS_BROKER_URL)
+REDIS_CLIENT_CLASS = "redis.Redis"
 
 WSGI_APPLICATION = "config.wsgi.application"
-# ASGI_APPLICATION = 'config.asgi.application'
+ASGI_APPLICATION = "config.asgi.application"
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {
+            "hosts": [REDIS_CHANNELS_URL],
+        },
+    },
+}
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
@@ -159,12 +254,14 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 KEY_PREFIX = config("KEY_PREFIX", default=PROJECT_NAME)
-CELERY_BROKER_URL = REDIS_URL
-CELERY_RESULT_BACKEND = REDIS_URL
+CELERY_BROKER_URL = REDIS_BROKER_URL
+CELERY_RESULT_BACKEND = REDIS_RESULT_URL
 CELERY_BEAT_SCHEDULER = "redbeat.RedBeatScheduler"
 # CELERYBEAT_SCHEDULE_FILENAME = config(
 #     'CELERYBEAT_SCHEDULE_FILENAME', default='/data/celerybeat-schedule.db')
 CELERY_BEAT_SCHEDULE = {}
+# The port of the worker's Prometheus metrics server (see core.task_metrics), 0 disables it
+CELERY_METRICS_PORT = config("CELERY_METRICS_PORT", default=9808, cast=int)
 
 
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="noreply@NEWPROJECTNAME.com")
@@ -174,6 +271,9 @@ USE_HTTPS = False
 
 LOGOUT_REDIRECT_URL = "/"
 
+# The admin sessions are read from the cache, the database keeps them
+# across the cache restarts
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
 SESSION_COOKIE_AGE = config("SESSION_COOKIE_AGE", default=604800, cast=int)  # 1 week in seconds by default
 
 
@@ -184,21 +284,108 @@ EMAIL_HOST_USER = config("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
 EMAIL_USE_SSL = config("EMAIL_USE_SSL", default="0", cast=bool)
 
+# Outgoing emails are buffered for EMAIL_BATCH_WINDOW seconds and sent in
+# batches of up to EMAIL_BATCH_SIZE messages over a single connection.
+EMAIL_BATCH_WINDOW = config("EMAIL_BATCH_WINDOW", default=2.0, cast=float)
+EMAIL_BATCH_SIZE = config("EMAIL_BATCH_SIZE", default=100, cast=int)
+EMAIL_MAX_ATTEMPTS = config("EMAIL_MAX_ATTEMPTS", default=5, cast=int)
+# Seconds before the first retry of a failed message, doubled on every
+# attempt (e.g. 60, 120, 240 and 480 seconds), so a temporary rejection
+# (greylisting) doesn't use up the attempts
+EMAIL_RETRY_DELAY = config("EMAIL_RETRY_DELAY", default=60, cast=float)
+# Seconds after which the batch of a flush whose worker died is delivered by
+# the next flush
+EMAIL_DELIVERY_LOCK_TIMEOUT = config("EMAIL_DELIVERY_LOCK_TIMEOUT", default=300, cast=int)
+# Maximum number of messages per minute for the recipient domains, e.g.
+# {"gmail.com": 300}
+EMAIL_DOMAIN_RATE_LIMITS = {}
+
 # Host for sending e-mail.
 
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": REDIS_URL,
+        "BACKEND": "core.metrics.InstrumentedRedisCache",
+        "LOCATION": REDIS_CACHE_URL,
         "KEY_PREFIX": KEY_PREFIX,
+        "OPTIONS": {
+            "max_connections": config("REDIS_CACHE_MAX_CONNECTIONS", default=50, cast=int),
+        },
     },
+    # The revoked refresh tokens (see accounts.revocation). The key prefix
+    # keeps them out of clear_cache even when they share the database.
+    "revocation": {
+        "BACKEND": "core.metrics.InstrumentedRedisCache",
+        "LOCATION": REDIS_REVOCATION_URL,
+        "KEY_PREFIX": f"{KEY_PREFIX}-revocation",
+    },
+}
+
+# The in-process cache in front of the default cache (see core.cache): the
+# maximal number of entries (0 disables it) and their lifetime in seconds
+TIERED_CACHE_LOCAL_MAX_ENTRIES = config("TIERED_CACHE_LOCAL_MAX_ENTRIES", default=1000, cast=int)
+TIERED_CACHE_LOCAL_TIMEOUT = config("TIERED_CACHE_LOCAL_TIMEOUT", default=5, cast=float)
+# The longest time a value is computed before the others compute it as well
+TIERED_CACHE_LOCK_TIMEOUT = config("TIERED_CACHE_LOCK_TIMEOUT", default=10, cast=float)
+
+# How long the authenticated user is kept in the cache (seconds)
+ACCOUNTS_USER_CACHE_TIMEOUT = config("ACCOUNTS_USER_CACHE_TIMEOUT", default=300, cast=int)
+
+# The admin bulk actions on more users than the limit run as Celery jobs
+# in chunks (see accounts.bulk_actions)
+ADMIN_BULK_ACTION_INLINE_LIMIT = config("ADMIN_BULK_ACTION_INLINE_LIMIT", default=1000, cast=int)
+ADMIN_BULK_ACTION_CHUNK_SIZE = config("ADMIN_BULK_ACTION_CHUNK_SIZE", default=5000, cast=int)
+# The number of users fetched at once by the streaming export (see accounts.export)
+ACCOUNTS_EXPORT_CHUNK_SIZE = config("ACCOUNTS_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Request metrics (see core.metrics). The /metrics endpoint requires
+# "Authorization: Bearer <METRICS_TOKEN>" if the token is set, the production
+# settings require it.
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+METRICS_SERVER_TIMING = config("METRICS_SERVER_TIMING", default=True, cast=bool)
+
+# The maximal number and total time (seconds) of the SQL queries of the views
+# by the URL name (see core.query_budget). QUERY_BUDGET_MODE is "warn" to log
+# the exceeded budgets, "raise" to fail the request or empty to skip the checks.
+QUERY_BUDGETS = {
+    "accounts_api:register": {"queries": 3, "time": 0.2},
+    "accounts_api:login": {"queries": 2, "time": 0.2},
+    "accounts_api:logout": {"queries": 2, "time": 0.2},
+    "accounts_api:change-password": {"queries": 3, "time": 0.2},
+    "accounts_api:profile": {"queries": 2, "time": 0.2},
+    "accounts_api:activate": {"queries": 2, "time": 0.2},
+    "accounts_api:user-list": {"queries": 2, "time": 0.2},
+    "accounts_api:user-search": {"queries": 2, "time": 0.2},
+    "accounts_api:user-export": {"queries": 2, "time": 0.2},
+    "token_obtain_pair": {"queries": 2, "time": 0.2},
+    "token_refresh": {"queries": 1, "time": 0.2},
+    "admin:accounts_user_changelist": {"queries": 10, "time": 0.5},
 }
+QUERY_BUDGET_MODE = config("QUERY_BUDGET_MODE", default="")
 
 # Configure REST framework
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_AUTHENTICATION_CLASSES": ("rest_framework_simplejwt.authentication.JWTAuthentication",),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("accounts.api.authentication.CachedJWTAuthentication",),
+    # orjson instead of json, the browsable API is added in development
+    "DEFAULT_RENDERER_CLASSES": ("core.renderers.ORJSONRenderer",),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    # Limits of the sliding window throttles (core.throttling), by client IP,
+    # target email and globally per endpoint
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": config("THROTTLE_LOGIN_IP", default="20/min"),
+        "login_email": config("THROTTLE_LOGIN_EMAIL", default="5/min"),
+        "login_global": config("THROTTLE_LOGIN_GLOBAL", default="3000/min"),
+        "register_ip": config("THROTTLE_REGISTER_IP", default="10/hour"),
+        "register_email": config("THROTTLE_REGISTER_EMAIL", default="3/hour"),
+        "register_global": config("THROTTLE_REGISTER_GLOBAL", default="600/min"),
+        "token_refresh_ip": config("THROTTLE_TOKEN_REFRESH_IP", default="60/min"),
+        "token_refresh_global": config("THROTTLE_TOKEN_REFRESH_GLOBAL", default="6000/min"),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
@@ -224,4 +411,10 @@ from datetime import timedelta
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "accounts.api.serializers.MyTokenRefreshSerializer",
+    # Where the revoked refresh tokens are stored. Use
+    # "accounts.revocation.DatabaseRevocationBackend" together with the
+    # "rest_framework_simplejwt.token_blacklist" app to keep them in the database.
+    "REVOCATION_BACKEND": config("JWT_REVOCATION_BACKEND", default="accounts.revocation.CacheRevocationBackend"),
+    "REVOCATION_CACHE_ALIAS": "revocation",
 }
@@ -0,0 +1,55 @@
+"""
+Settings of the load test and the benchmarks (see the `benchmarks` package).
+
+They run offline with SQLite and fakeredis. Set `BENCH_DATABASE=postgres`
+and `BENCH_REDIS=1` to use the PostgreSQL and Redis configured in the
+environment instead.
+"""
+
+import tempfile
+from pathlib import Path
+
+from decouple import config
+
+from .base import *
+
+DEBUG = False
+CONFIGURATION = "bench"
+ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
+
+if config("BENCH_DATABASE", default="sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": config("BENCH_SQLITE_PATH", default=str(Path(tempfile.gettempdir()) / "bench.sqlite3")),
+            # The server workers write concurrently
+            "OPTIONS": {
+                "init_command": "PRAGMA journal_mode=WAL;",
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 30,
+            },
+        },
+    }
+
+if not config("BENCH_REDIS", default=False, cast=bool):
+    from fakeredis import FakeConnection
+
+    # Every process has its own fake Redis server
+    REDIS_CLIENT_CLASS = "fakeredis.FakeRedis"
+    CACHES["default"]["OPTIONS"] = {"connection_class": FakeConnection}
+    CACHES["revocation"]["OPTIONS"] = {"connection_class": FakeConnection}
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
+    CELERY_TASK_ALWAYS_EAGER = True
+
+# The load test registers and logs in many users from one address
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {scope: "1000000/min" for scope in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]},
+}
+
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+CELERY_METRICS_PORT = 0
@@ -4,6 +4,9 @@ from .base import *
 
 DEBUG = False
 
+# Required, without it the /metrics endpoint would be public
+METRICS_TOKEN = config("METRICS_TOKEN")
+
 USE_HTTPS = config("USE_HTTPS", default="0", cast=bool)
 
 if USE_HTTPS:
@@ -4,15 +4,38 @@ DEBUG = False
 
 CELERY_BROKER_URL = "redis://"
 CELERY_RESULT_BACKEND = "redis://"
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_METRICS_PORT = 0
+
+# The exceeded numbers of queries fail the tests, the exceeded times are only
+# logged (see core.query_budget)
+QUERY_BUDGET_MODE = "raise"
+
+# A stand-in replica for the tests of the routing, enabled by overriding
+# REPLICA_DATABASES
+DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+
+REDIS_CLIENT_CLASS = "fakeredis.FakeRedis"
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
 
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.MD5PasswordHasher",
 ]
+PASSWORD_HASHING_WORKERS = 0
 
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.dummy.DummyCache",
-    }
+    },
+    "revocation": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "revocation",
+    },
 }
 
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
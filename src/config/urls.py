@@ -8,6 +8,8 @@ from drf_spectacular.views import (
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from accounts.api.throttling import LoginRateThrottle, TokenRefreshRateThrottle
+
 admin.site.site_header = "NEWPROJECTNAME | Admin console"
 # admin.site.enable_nav_sidebar = False
 
@@ -15,8 +17,12 @@ admin.site.site_header = "NEWPROJECTNAME | Admin console"
 urlpatterns = [
     path("superadmin/doc/", include("django.contrib.admindocs.urls")),
     path("superadmin/", admin.site.urls),
-    path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/token/", TokenObtainPairView.as_view(throttle_classes=(LoginRateThrottle,)), name="token_obtain_pair"),
+    path(
+        "api/token/refresh/",
+        TokenRefreshView.as_view(throttle_classes=(TokenRefreshRateThrottle,)),
+        name="token_refresh",
+    ),
     # drf-spectacular URLs
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     # Swagger UI
@@ -0,0 +1,439 @@
+"""
+Two-tier cache: a bounded in-process LRU cache (L1) in front of a Django
+cache, usually Redis (L2).
+
+    from core.cache import cached, namespace, tiered_cache
+
+    @cached(timeout=300, stale_timeout=60, namespace="accounts")
+    def get_user_summary(user):
+        ...
+
+    class ArticleView(APIView):
+        @cached(timeout=60)
+        def get(self, request, slug):
+            ...
+
+    tiered_cache.get_or_set("key", compute, timeout=60)
+    namespace("accounts").invalidate()
+
+The L1 entries live at most `TIERED_CACHE_LOCAL_TIMEOUT` seconds. Every
+write to the L2 is announced over Redis pub/sub, and the other processes
+drop their L1 copies of the key.
+
+On a miss only one process computes the value (single-flight, a lock in
+the L2), the others wait for the result. With `stale_timeout`, an expired
+value is served for that long while one process computes the new one.
+A namespace prefixes its keys with a version, so all of them are
+invalidated at once by changing the version.
+
+The reads are counted by the tier and the result in the
+`django_tiered_cache_requests` metric and in `TieredCache.stats`.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import Counter as StatsCounter, OrderedDict, namedtuple
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.signals import setting_changed
+from django.db.models import Model
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.template.response import SimpleTemplateResponse
+from django.utils.encoding import force_str
+from django.views import View
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from core.redis import get_redis_connection
+
+__all__ = [
+    "LocalCache",
+    "Namespace",
+    "TieredCache",
+    "cached",
+    "namespace",
+    "tiered_cache",
+]
+
+logger = logging.getLogger(__name__)
+
+TIERED_CACHE_REQUESTS = Counter(
+    "django_tiered_cache_requests",
+    "Number of reads of the two-tier cache",
+    ["tier", "result"],
+)
+
+# Seconds between the checks of the L2 while another process computes the value
+WAIT_INTERVAL = 0.05
+# Seconds before the invalidation listener reconnects to Redis
+RECONNECT_DELAY = 5
+
+_MISSING = object()
+
+# The data of a response returned by a handler of a DRF view, which the
+# view renders after the handler
+ResponseData = namedtuple("ResponseData", ["data", "status", "headers", "content_type"])
+
+
+class LocalCache:
+    """
+    Thread-safe LRU cache with per-entry expiration, holding at most
+    `max_entries` entries. The values are pickled, so the callers can't
+    change the cached ones.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class TieredCache:
+    """
+    The values are stored in the L2 as `(fresh_until, stale_until, value)`
+    envelopes, the times are Unix timestamps or `None` for no expiration.
+    """
+
+    def __init__(self, alias=DEFAULT_CACHE_ALIAS):
+        self.alias = alias
+        # Identifies the messages of this instance, which it ignores
+        self.origin = uuid4().hex
+        self.local = None
+        self.pid = None
+        self.setup_lock = threading.Lock()
+        self.stats = StatsCounter()
+        self.counters = {
+            (tier, result): TIERED_CACHE_REQUESTS.labels(tier, result)
+            for tier in ("l1", "l2")
+            for result in ("hit", "miss", "stale")
+        }
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def channel(self):
+        return f"{self.cache.key_prefix}:tiered-cache-invalidation"
+
+    def record(self, tier, result):
+        self.stats[f"{tier}_{result}"] += 1
+        self.counters[tier, result].inc()
+
+    def get_local(self):
+        """
+        Returns the L1 cache of the process, `None` if it's disabled. A new
+        one is created in a forked process, together with its invalidation
+        listener.
+        """
+        if self.pid != os.getpid():
+            with self.setup_lock:
+                if self.pid != os.getpid():
+                    self.local = None
+                    if settings.TIERED_CACHE_LOCAL_MAX_ENTRIES:
+                        self.local = LocalCache(settings.TIERED_CACHE_LOCAL_MAX_ENTRIES)
+                        threading.Thread(
+                            target=self.listen, args=(self.local,), name="tiered-cache-invalidation", daemon=True
+                        ).start()
+                    self.pid = os.getpid()
+        return self.local
+
+    def listen(self, local):
+        while self.local is local:
+            try:
+                pubsub = get_redis_connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # The messages published while disconnected are lost
+                local.clear()
+                while self.local is local:
+                    message = pubsub.get_message(timeout=1)
+                    if message is None:
+                        continue
+                    origin, _, key = force_str(message["data"]).partition(" ")
+                    if origin != self.origin:
+                        local.delete(key)
+                pubsub.close()
+            except RedisError:
+                logger.warning("The cache invalidation listener lost the connection to Redis", exc_info=True)
+                time.sleep(RECONNECT_DELAY)
+
+    def publish(self, key):
+        try:
+            get_redis_connection().publish(self.channel, f"{self.origin} {key}")
+        except RedisError:
+            logger.warning("Failed to publish the invalidation of %s", key, exc_info=True)
+
+    def reset(self):
+        """
+        Drops the L1 cache, it's recreated on the next use.
+        """
+        with self.setup_lock:
+            self.local = None
+            self.pid = None
+
+    def get_envelope(self, key):
+        local = self.get_local()
+        if local is not None:
+            envelope = local.get(key)
+            if envelope is not _MISSING:
+                self.record("l1", "hit")
+                return envelope
+            self.record("l1", "miss")
+
+        envelope = self.cache.get(key)
+        self.record("l2", "miss" if envelope is None else "hit")
+        if envelope is not None and local is not None:
+            self.set_local(local, key, envelope)
+        return envelope
+
+    def set_local(self, local, key, envelope):
+        timeout = settings.TIERED_CACHE_LOCAL_TIMEOUT
+        stale_until = envelope[1]
+        if stale_until is not None:
+            timeout = min(timeout, stale_until - time.time())
+        if timeout > 0:
+            local.set(key, envelope, timeout)
+
+    def get(self, key, default=None):
+        envelope = self.get_envelope(key)
+        if envelope is None:
+            return default
+        fresh_until, _, value = envelope
+        if fresh_until is not None and fresh_until <= time.time():
+            return default
+        return value
+
+    def make_envelope(self, value, timeout, stale_timeout):
+        if timeout is None:
+            return (None, None, value), None
+        now = time.time()
+        return (now + timeout, now + timeout + stale_timeout, value), timeout + stale_timeout
+
+    def set(self, key, value, timeout=None, stale_timeout=0):
+        envelope, l2_timeout = self.make_envelope(value, timeout, stale_timeout)
+        self.cache.set(key, envelope, l2_timeout)
+        if (local := self.get_local()) is not None:
+            self.set_local(local, key, envelope)
+        self.publish(key)
+
+    def add(self, key, value, timeout=None):
+        envelope, l2_timeout = self.make_envelope(value, timeout, 0)
+        added = self.cache.add(key, envelope, l2_timeout)
+        if added:
+            self.publish(key)
+        return added
+
+    def delete(self, key):
+        self.cache.delete(key)
+        if (local := self.get_local()) is not None:
+            local.delete(key)
+        self.publish(key)
+
+    def get_or_set(self, key, func, timeout=None, stale_timeout=0):
+        """
+        Returns the cached value, or calls `func` to compute it. Only one
+        caller computes a missing value, the others wait for it at most
+        `TIERED_CACHE_LOCK_TIMEOUT` seconds. A stale value is returned by the
+        others while one caller computes the new value.
+        """
+        envelope = self.get_envelope(key)
+        if envelope is not None:
+            fresh_until, stale_until, value = envelope
+            now = time.time()
+            if fresh_until is None or now < fresh_until:
+                return value
+            if now < stale_until:
+                self.record("l2", "stale")
+                if not self.lock(key):
+                    return value
+                return self.compute(key, func, timeout, stale_timeout)
+
+        if self.lock(key):
+            return self.compute(key, func, timeout, stale_timeout)
+
+        deadline = time.monotonic() + settings.TIERED_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            envelope = self.cache.get(key)
+            if envelope is not None:
+                return envelope[2]
+        # The computation failed or takes too long
+        value = func()
+        self.set(key, value, timeout, stale_timeout)
+        return value
+
+    def lock(self, key):
+        return self.cache.add(f"{key}:lock", self.origin, settings.TIERED_CACHE_LOCK_TIMEOUT)
+
+    def compute(self, key, func, timeout, stale_timeout):
+        try:
+            value = func()
+            self.set(key, value, timeout, stale_timeout)
+            return value
+        finally:
+            self.cache.delete(f"{key}:lock")
+
+
+tiered_cache = TieredCache()
+
+
+@receiver(setting_changed)
+def reset_local_cache(setting, **kwargs):
+    if setting == "CACHES" or setting.startswith("TIERED_CACHE_"):
+        tiered_cache.reset()
+
+
+class Namespace:
+    """
+    A group of keys invalidated together. The keys are prefixed with the
+    current version of the namespace, which is replaced by `invalidate()`.
+    """
+
+    def __init__(self, name, cache=None):
+        self.name = name
+        self.cache = cache or tiered_cache
+        self.version_key = f"namespace:{name}:version"
+
+    def get_version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, uuid4().hex[:12])
+            version = self.cache.get(self.version_key)
+        return version
+
+    def make_key(self, key):
+        return f"{self.name}:{self.get_version()}:{key}"
+
+    def get(self, key, default=None):
+        return self.cache.get(self.make_key(key), default)
+
+    def set(self, key, value, timeout=None, stale_timeout=0):
+        self.cache.set(self.make_key(key), value, timeout, stale_timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+    def get_or_set(self, key, func, timeout=None, stale_timeout=0):
+        return self.cache.get_or_set(self.make_key(key), func, timeout, stale_timeout)
+
+    def invalidate(self):
+        """
+        Invalidates all the keys of the namespace, the old entries expire
+        on their own.
+        """
+        self.cache.set(self.version_key, uuid4().hex[:12])
+
+
+def namespace(name):
+    return Namespace(name)
+
+
+def make_key_part(value):
+    if isinstance(value, Model):
+        return f"{value._meta.label}:{value.pk}"
+    if isinstance(value, (HttpRequest, Request)):
+        return f"{value.method}:{value.get_full_path()}"
+    return repr(value)
+
+
+def make_key(prefix, args, kwargs):
+    # The view of a decorated method isn't part of the key, it's a new
+    # instance for every request
+    parts = [make_key_part(arg) for arg in args if not isinstance(arg, View)]
+    parts.extend(f"{name}={make_key_part(value)}" for name, value in sorted(kwargs.items()))
+    return f"{prefix}:{hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()}"
+
+
+def freeze_result(value):
+    """
+    Returns the value to cache for a result of the function. The responses
+    must be rendered to be pickled: the template responses are rendered
+    here, but a DRF response returned by a handler of the view is rendered
+    by the view, so only its data is cached.
+    """
+    if isinstance(value, Response) and getattr(value, "accepted_renderer", None) is None:
+        headers = {name: header for name, header in value.items() if name != "Content-Type"}
+        return ResponseData(value.data, value.status_code, headers, value.content_type)
+    if isinstance(value, SimpleTemplateResponse) and not value.is_rendered:
+        value.render()
+    return value
+
+
+def thaw_result(value):
+    if isinstance(value, ResponseData):
+        return Response(value.data, value.status, headers=value.headers, content_type=value.content_type)
+    return value
+
+
+def cached(timeout=None, stale_timeout=0, namespace=None, key=None):
+    """
+    Caches the results of the function in the two-tier cache by its
+    arguments. The model instances are identified by the primary key and
+    the requests by the method and the URL, so a cached view must not
+    depend on the user or the headers. A method of a view is cached by its
+    other arguments. `key` is an optional function building the key from
+    the arguments instead.
+
+    The decorated function has an `invalidate(*args, **kwargs)` method
+    removing the cached result of the given arguments.
+    """
+
+    def decorator(func):
+        prefix = f"{func.__module__}.{func.__qualname__}"
+        target = Namespace(namespace) if namespace else tiered_cache
+
+        def get_key(*args, **kwargs):
+            return key(*args, **kwargs) if key else make_key(prefix, args, kwargs)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            value = target.get_or_set(
+                get_key(*args, **kwargs), lambda: freeze_result(func(*args, **kwargs)), timeout, stale_timeout
+            )
+            return thaw_result(value)
+
+        wrapper.invalidate = lambda *args, **kwargs: target.delete(get_key(*args, **kwargs))
+        return wrapper
+
+    return decorator
@@ -0,0 +1,62 @@
+import csv
+import io
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# The execute wrappers of the current context, see `execute_wrapper()`
+_execute_wrappers = ContextVar("execute_wrappers", default=())
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """
+    Like `connection.execute_wrapper()`, but for the queries of all the
+    connections run in the current context, including the ones of the
+    threads started by `sync_to_async()` (the sync views under ASGI) and
+    the connections which aren't created yet.
+    """
+    token = _execute_wrappers.set((*_execute_wrappers.get(), wrapper))
+    try:
+        yield
+    finally:
+        _execute_wrappers.reset(token)
+
+
+def run_execute_wrappers(execute, sql, params, many, context):
+    for wrapper in reversed(_execute_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_execute_wrappers(sender, connection, **kwargs):
+    # The wrappers are kept by the connection wrapper across reconnections
+    if run_execute_wrappers not in connection.execute_wrappers:
+        connection.execute_wrappers.append(run_execute_wrappers)
+
+
+def copy_rows(cursor, table, columns, rows):
+    """
+    Loads the rows into the table with PostgreSQL `COPY ... FROM STDIN`.
+    Works with both psycopg2 and psycopg 3 cursors.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    quote_name = cursor.db.ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        quote_name(table),
+        ", ".join(quote_name(column) for column in columns),
+    )
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, "copy_expert"):
+        # psycopg2
+        raw_cursor.copy_expert(sql, buffer)
+    else:
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
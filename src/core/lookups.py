@@ -0,0 +1,27 @@
+from django.db.models import CharField, TextField
+from django.db.models.lookups import IContains
+
+__all__ = [
+    "ILike",
+]
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class ILike(IContains):
+    """
+    Case-insensitive containment test compiled to `column ILIKE '%term%'` on
+    PostgreSQL, so it is served by a trigram (`gin_trgm_ops`) index on the
+    column itself. `icontains` wraps the column in UPPER() which the index
+    can't serve. Other databases fall back to `icontains`.
+    """
+
+    lookup_name = "ilike"
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        lhs_sql, params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs_sql} ILIKE {rhs_sql}", (*params, *rhs_params)
@@ -1,8 +1,70 @@
-from django.core.management.base import BaseCommand
+import re
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import Namespace
+
+
+def escape_pattern(value):
+    """
+    Escapes the glob characters of the Redis `MATCH` pattern.
+    """
+    return re.sub(r"([*?\[\]\\])", r"\\\1", value)
 
 
 class Command(BaseCommand):
+    help = (
+        "Deletes the cache keys under KEY_PREFIX, optionally only of a namespace or a version. "
+        "The keys are found with SCAN and deleted with UNLINK in batches, so Redis isn't blocked "
+        "and the other data in the same database (Celery, RedBeat) is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--namespace", help="Delete only the keys of the core.cache namespace.")
+        parser.add_argument("--key-version", type=int, help="Delete only the keys of the version.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Count the keys without deleting them.")
+
     def handle(self, *args, **options):
-        from django.core.cache import cache
+        cache = caches[DEFAULT_CACHE_ALIAS]
+        if not isinstance(cache, RedisCache):
+            if options["namespace"] or options["key_version"] is not None or options["dry_run"]:
+                raise CommandError("The scoped and dry-run clearing needs the Redis cache backend.")
+            cache.clear()
+            return
+
+        client = cache._cache.get_client(write=True)
+        patterns = self.get_patterns(cache.key_prefix, options["namespace"], options["key_version"])
+        count = 0
+        for pattern in patterns:
+            keys = []
+            for key in client.scan_iter(match=pattern, count=options["batch_size"]):
+                keys.append(key)
+                if len(keys) >= options["batch_size"]:
+                    count += self.delete(client, keys, options["dry_run"])
+                    keys = []
+            count += self.delete(client, keys, options["dry_run"])
+
+        if options["dry_run"]:
+            self.stdout.write(f"{count} keys would be deleted.")
+            return
+        if options["namespace"]:
+            # The other processes drop the old version from their local caches
+            Namespace(options["namespace"]).invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} keys."))
+
+    def get_patterns(self, key_prefix, namespace, version):
+        version = "*" if version is None else str(version)
+        # The keys are made by the default KEY_FUNCTION: "prefix:version:key"
+        prefix = f"{escape_pattern(key_prefix)}:{version}:"
+        if namespace is None:
+            return [f"{prefix}*"]
+        namespace = escape_pattern(namespace)
+        return [f"{prefix}{namespace}:*", f"{prefix}namespace:{namespace}:version"]
 
-        cache.clear()
+    def delete(self, client, keys, dry_run):
+        if keys and not dry_run:
+            client.unlink(*keys)
+        return len(keys)
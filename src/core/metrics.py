@@ -0,0 +1,219 @@
+"""
+Request-level performance metrics exported in the Prometheus format.
+
+`metrics_middleware` records the latency, the number and the time of the
+database queries, the cache hits and misses and the size of every response
+by the view name, and sends the per-request numbers back in the
+`Server-Timing` header. The metrics are served by `core.views.metrics`.
+
+With several worker processes (gunicorn), set `PROMETHEUS_MULTIPROC_DIR`
+to an empty directory shared by the workers, so the metrics of all the
+processes are aggregated.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from functools import cache
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+
+from core.db import execute_wrapper
+
+__all__ = [
+    "InstrumentedCacheMixin",
+    "InstrumentedRedisCache",
+    "RequestMetrics",
+    "get_registry",
+    "metrics_middleware",
+]
+
+REQUEST_LATENCY = Histogram(
+    "django_http_request_duration_seconds",
+    "Time spent processing the request",
+    ["view", "method"],
+)
+REQUESTS = Counter(
+    "django_http_requests",
+    "Number of processed requests",
+    ["view", "method", "status"],
+)
+DB_QUERIES = Histogram(
+    "django_http_db_queries",
+    "Number of database queries per request",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_DURATION = Histogram(
+    "django_http_db_duration_seconds",
+    "Time spent in database queries per request",
+    ["view"],
+)
+RESPONSE_SIZE = Histogram(
+    "django_http_response_size_bytes",
+    "Size of the response body",
+    ["view"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+CACHE_REQUESTS = Counter(
+    "django_cache_requests",
+    "Number of cache reads",
+    ["result"],
+)
+CACHE_HITS = CACHE_REQUESTS.labels("hit")
+CACHE_MISSES = CACHE_REQUESTS.labels("miss")
+
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+UNRESOLVED_VIEW = "<unresolved>"
+
+_MISSING = object()
+
+_request_metrics = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Collects the numbers of a single request. The instance is installed as
+    a database execute wrapper, so it counts and times every query.
+    """
+
+    __slots__ = ("queries", "db_time", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self, duration):
+        return (
+            f'app;dur={duration * 1000:.2f}, db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries", '
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"'
+        )
+
+
+def record_cache_reads(hits, misses):
+    if hits:
+        CACHE_HITS.inc(hits)
+    if misses:
+        CACHE_MISSES.inc(misses)
+    metrics = _request_metrics.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class InstrumentedCacheMixin:
+    """
+    Counts the hits and misses of the cache reads.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            record_cache_reads(0, 1)
+            return default
+        record_cache_reads(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        record_cache_reads(len(values), len(keys) - len(values))
+        return values
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+def get_view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else UNRESOLVED_VIEW
+
+
+@cache
+def get_view_metrics(view, method):
+    """
+    Returns the metrics of the view. Looking up the labelled metrics takes
+    longer than recording a value, so they are looked up once per view.
+    """
+    return (
+        REQUEST_LATENCY.labels(view, method),
+        DB_QUERIES.labels(view),
+        DB_DURATION.labels(view),
+        RESPONSE_SIZE.labels(view),
+    )
+
+
+def record_request(request, response, metrics, duration):
+    view = get_view_name(request)
+    method = request.method if request.method in METHODS else "other"
+    latency, db_queries, db_duration, response_size = get_view_metrics(view, method)
+    latency.observe(duration)
+    REQUESTS.labels(view, method, response.status_code).inc()
+    db_queries.observe(metrics.queries)
+    db_duration.observe(metrics.db_time)
+    if not response.streaming:
+        response_size.observe(len(response.content))
+
+    if settings.METRICS_SERVER_TIMING:
+        response["Server-Timing"] = metrics.server_timing(duration)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    # The queries are counted through core.db.execute_wrapper(), so the ones
+    # run by the sync views in the threads of an ASGI server are included
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            metrics = RequestMetrics()
+            token = _request_metrics.set(metrics)
+            start = time.perf_counter()
+            try:
+                with execute_wrapper(metrics):
+                    response = await get_response(request)
+            finally:
+                _request_metrics.reset(token)
+            record_request(request, response, metrics, time.perf_counter() - start)
+            return response
+
+    else:
+
+        def middleware(request):
+            metrics = RequestMetrics()
+            token = _request_metrics.set(metrics)
+            start = time.perf_counter()
+            try:
+                with execute_wrapper(metrics):
+                    response = get_response(request)
+            finally:
+                _request_metrics.reset(token)
+            record_request(request, response, metrics, time.perf_counter() - start)
+            return response
+
+    return middleware
+
+
+def get_registry():
+    """
+    Returns the registry with the metrics of all the worker processes.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
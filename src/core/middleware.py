@@ -1,11 +1,22 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.exception import convert_exception_to_response
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from django.utils.module_loading import import_string
 
 __all__ = [
+    "PathMiddleware",
     "is_restricted_internal_url",
     "login_required_middleware",
 ]
 
+# Adapts a handler or a hook to the sync or async mode, it doesn't use the
+# handler's state
+adapt_method_mode = BaseHandler().adapt_method_mode
+
 
 def is_restricted_internal_url(url):
     URL_PREFIXES_EXCLUDES = [
@@ -32,3 +43,139 @@ def login_required_middleware(get_response):
         return response
 
     return middleware
+
+
+class MiddlewareChain:
+    """
+    The middlewares of `paths` in front of `get_response`, loaded the same
+    way `BaseHandler.load_middleware()` loads `MIDDLEWARE`: every middleware
+    runs in the mode it supports, adapted to its handler only if needed, and
+    the hooks are adapted to the mode of the chain.
+    """
+
+    def __init__(self, paths, get_response, is_async=False):
+        self.is_async = is_async
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+        handler = get_response
+        handler_is_async = is_async
+        for path in reversed(paths):
+            middleware = import_string(path)
+            middleware_can_sync = getattr(middleware, "sync_capable", True)
+            middleware_can_async = getattr(middleware, "async_capable", False)
+            if not handler_is_async and middleware_can_sync:
+                middleware_is_async = False
+            else:
+                middleware_is_async = middleware_can_async
+            try:
+                adapted_handler = adapt_method_mode(
+                    middleware_is_async, handler, handler_is_async, debug=settings.DEBUG, name=f"middleware {path}"
+                )
+                instance = middleware(adapted_handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(instance, "process_view"):
+                self.view_middleware.insert(0, adapt_method_mode(is_async, instance.process_view))
+            if hasattr(instance, "process_template_response"):
+                self.template_response_middleware.append(
+                    adapt_method_mode(is_async, instance.process_template_response)
+                )
+            if hasattr(instance, "process_exception"):
+                # Always synchronous, like the handler's exception middlewares
+                self.exception_middleware.append(adapt_method_mode(False, instance.process_exception))
+
+            handler = convert_exception_to_response(instance)
+            handler_is_async = middleware_is_async
+        self.handler = adapt_method_mode(is_async, handler, handler_is_async)
+
+    def __call__(self, request):
+        return self.handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for process_view in self.view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        for process_view in self.view_middleware:
+            response = await process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for process_template_response in self.template_response_middleware:
+            response = process_template_response(request, response)
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        for process_template_response in self.template_response_middleware:
+            response = await process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for process_exception in self.exception_middleware:
+            response = process_exception(request, exception)
+            if response is not None:
+                return response
+        return None
+
+
+class PathMiddleware:
+    """
+    Runs the middlewares of `PATH_MIDDLEWARE` chosen by the longest prefix
+    of the request path, e.g. the API routes authenticated by the JWT skip
+    the session, CSRF and messages middlewares, which only the browser
+    routes need. The hooks (`process_view()` etc.) of the chosen middlewares
+    are called as if they were listed in `MIDDLEWARE`.
+
+    Under ASGI the middleware and the chains run asynchronously, so the
+    requests don't go through a thread just for the middlewares.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.is_async = iscoroutinefunction(get_response)
+        routes = sorted(settings.PATH_MIDDLEWARE.items(), key=lambda item: len(item[0]), reverse=True)
+        self.chains = [(prefix, MiddlewareChain(paths, get_response, self.is_async)) for prefix, paths in routes]
+        if self.is_async:
+            # The handler calls the hooks which are coroutine functions
+            # without adapting them, as it does with the async middlewares
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def get_chain(self, request):
+        for prefix, chain in self.chains:
+            if request.path_info.startswith(prefix):
+                return chain
+        raise ValueError(f"PATH_MIDDLEWARE has no route for {request.path_info}")
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.get_chain(request)(request)
+
+    async def __acall__(self, request):
+        return await self.get_chain(request)(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self.get_chain(request).process_view(request, view_func, view_args, view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return await self.get_chain(request).aprocess_view(request, view_func, view_args, view_kwargs)
+
+    def process_template_response(self, request, response):
+        return self.get_chain(request).process_template_response(request, response)
+
+    async def aprocess_template_response(self, request, response):
+        return await self.get_chain(request).aprocess_template_response(request, response)
+
+    def process_exception(self, request, exception):
+        return self.get_chain(request).process_exception(request, exception)
@@ -0,0 +1,141 @@
+"""
+Keyset (seek) pagination for DRF.
+
+The cursor holds the ordering values of the last row of the page, and the
+next page is selected by comparing them with the rows instead of skipping
+an offset. With an index on the ordering fields every page costs the same
+as the first one, and the pagination never counts the rows.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+__all__ = [
+    "KeysetPagination",
+]
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # Keeps the microseconds, which DjangoJSONEncoder truncates
+        if isinstance(o, datetime.datetime | datetime.time):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates the queryset ordered by one of `orderings`, a mapping of the
+    `ordering` query parameter values to a field. The primary key breaks
+    the ties, so the index serving an ordering must be on (field, pk).
+    """
+
+    orderings = {}
+    default_ordering = None
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = request.query_params.get(self.ordering_query_param, self.default_ordering)
+        if self.ordering not in self.orderings:
+            self.ordering = self.default_ordering
+        self.page_size = self.get_page_size(request)
+
+        descending = self.ordering.startswith("-")
+        field_name = self.orderings[self.ordering]
+        field = queryset.model._meta.get_field(field_name)
+        queryset = queryset.order_by(*(f"-{name}" if descending else name for name in (field_name, "pk")))
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor, field)
+            lookup = "lt" if descending else "gt"
+            # The first condition is the index range, the rest filters its boundary
+            queryset = queryset.filter(
+                Q(**{f"{field_name}__{lookup}e": value})
+                & (Q(**{f"{field_name}__{lookup}": value}) | Q(**{f"pk__{lookup}": pk}))
+            )
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        self.next_cursor = self.encode_cursor(getattr(rows[-1], field.attname), rows[-1].pk) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, value, pk):
+        data = json.dumps([value, pk], cls=CursorEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor, field):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            return field.to_python(value), int(pk)
+        except (binascii.Error, ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message) from None
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.next_cursor
+        return self.request.build_absolute_uri(f"{self.request.path}?{urlencode(params, doseq=True)}")
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.ordering_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Which field to use when ordering the results.",
+                "schema": {"type": "string", "enum": list(self.orderings), "default": self.default_ordering},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer", "maximum": self.max_page_size},
+            },
+        ]
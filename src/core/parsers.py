@@ -0,0 +1,29 @@
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from core.renderers import ORJSONRenderer
+
+__all__ = [
+    "ORJSONParser",
+]
+
+
+class ORJSONParser(JSONParser):
+    """
+    `JSONParser` using orjson, which rejects NaN and Infinity like
+    `JSONParser` with the default `STRICT_JSON`.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        data = stream.read()
+        try:
+            if encoding.lower().replace("-", "") != "utf8":
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except (ValueError, LookupError) as exc:
+            raise ParseError(f"JSON parse error - {exc}") from exc
@@ -0,0 +1,219 @@
+"""
+Per-endpoint budgets of the number and the total time of the database
+queries.
+
+The budget of a view is declared with the `query_budget` decorator or in
+the `QUERY_BUDGETS` setting by the URL name, e.g.
+
+    QUERY_BUDGETS = {
+        "accounts_api:profile": {"queries": 2, "time": 0.05},
+    }
+
+`query_budget_middleware` checks every request against the budget of its
+view. Depending on `QUERY_BUDGET_MODE` an exceeded budget is logged
+together with the offending queries ("warn", used in development) or
+raises `QueryBudgetExceeded` ("raise", used by the test suite). The time of
+the queries depends on the load of the machine, so an exceeded time budget
+is only logged in both modes. The queries of a streaming response are
+counted until its content is consumed, and checked at the end.
+"""
+
+import logging
+import time
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from core import db, metrics
+from core.db import execute_wrapper
+
+__all__ = [
+    "QueryBudget",
+    "QueryBudgetExceeded",
+    "get_query_budget",
+    "query_budget",
+    "query_budget_middleware",
+]
+
+logger = logging.getLogger(__name__)
+
+STACK_EXCERPT_SIZE = 3
+# The middlewares wrapping the views are left out from the stack excerpts
+IGNORED_FILES = {__file__, db.__file__, metrics.__file__}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    queries: int | None = None
+    time: float | None = None
+
+    def check(self, queries):
+        """
+        Returns the description of the exceeded limits, empty if the queries
+        are within the budget.
+        """
+        return [problem for problem in (self.check_count(queries), self.check_time(queries)) if problem]
+
+    def check_count(self, queries):
+        if self.queries is not None and len(queries) > self.queries:
+            return f"{len(queries)} queries (budget {self.queries})"
+        return None
+
+    def check_time(self, queries):
+        total = sum(query.duration for query in queries)
+        if self.time is not None and total > self.time:
+            return f"{total * 1000:.1f} ms of SQL (budget {self.time * 1000:.1f} ms)"
+        return None
+
+
+def query_budget(queries=None, time=None):
+    """
+    Declares the query budget of a view function or class.
+    """
+
+    def decorator(view):
+        view.query_budget = QueryBudget(queries, time)
+        return view
+
+    return decorator
+
+
+def get_query_budget(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    view = getattr(match.func, "view_class", match.func)
+    budget = getattr(view, "query_budget", None)
+    if budget is None and match.view_name in settings.QUERY_BUDGETS:
+        budget = QueryBudget(**settings.QUERY_BUDGETS[match.view_name])
+    return budget
+
+
+@dataclass
+class ExecutedQuery:
+    sql: str
+    duration: float
+    stack: list
+
+
+def get_stack_excerpt():
+    """
+    Returns the innermost frames of the project code which caused the query.
+    """
+    base_dir = str(Path(settings.BASE_DIR))
+    frames = [
+        frame
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and frame.filename not in IGNORED_FILES
+    ]
+    return frames[-STACK_EXCERPT_SIZE:]
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(ExecutedQuery(sql, time.perf_counter() - start, get_stack_excerpt()))
+
+
+def format_report(request, problems, queries):
+    lines = [f"Query budget exceeded by {request.method} {request.path}: {', '.join(problems)}"]
+    for query in sorted(queries, key=lambda query: query.duration, reverse=True):
+        lines.append(f"  {query.duration * 1000:.2f} ms: {query.sql}")
+        lines.extend(f"      {frame.filename}:{frame.lineno} in {frame.name}" for frame in query.stack)
+    return "\n".join(lines)
+
+
+def check_query_budget(request, recorder, mode):
+    budget = get_query_budget(request)
+    problems = budget.check(recorder.queries) if budget else None
+    if problems:
+        report = format_report(request, problems, recorder.queries)
+        if mode == "raise" and budget.check_count(recorder.queries):
+            raise QueryBudgetExceeded(report)
+        logger.warning(report)
+
+
+def record_streaming_content(response, request, recorder, mode):
+    """
+    Records the queries run while the content is produced (e.g. by
+    `QuerySet.iterator()`), and checks the budget once it's consumed. The
+    recorder is active only while a chunk is produced.
+    """
+    content = response.streaming_content
+
+    if response.is_async:
+
+        async def recorded():
+            while True:
+                with execute_wrapper(recorder):
+                    try:
+                        chunk = await anext(content)
+                    except StopAsyncIteration:
+                        break
+                yield chunk
+            check_query_budget(request, recorder, mode)
+
+    else:
+
+        def recorded():
+            while True:
+                with execute_wrapper(recorder):
+                    chunk = next(content, None)
+                if chunk is None:
+                    break
+                yield chunk
+            check_query_budget(request, recorder, mode)
+
+    response.streaming_content = recorded()
+    return response
+
+
+@sync_and_async_middleware
+def query_budget_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            mode = settings.QUERY_BUDGET_MODE
+            if not mode:
+                return await get_response(request)
+
+            recorder = QueryRecorder()
+            with execute_wrapper(recorder):
+                response = await get_response(request)
+            if response.streaming:
+                return record_streaming_content(response, request, recorder, mode)
+            check_query_budget(request, recorder, mode)
+            return response
+
+    else:
+
+        def middleware(request):
+            mode = settings.QUERY_BUDGET_MODE
+            if not mode:
+                return get_response(request)
+
+            recorder = QueryRecorder()
+            with execute_wrapper(recorder):
+                response = get_response(request)
+            if response.streaming:
+                return record_streaming_content(response, request, recorder, mode)
+            check_query_budget(request, recorder, mode)
+            return response
+
+    return middleware
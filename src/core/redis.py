@@ -0,0 +1,22 @@
+from functools import cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+@cache
+def get_redis_connection():
+    """
+    Returns the Redis client shared by the process. It is meant for the data
+    structures the Django cache API doesn't provide (lists, pipelines, etc).
+    """
+    client_class = import_string(settings.REDIS_CLIENT_CLASS)
+    return client_class.from_url(settings.REDIS_URL)
+
+
+@receiver(setting_changed)
+def reset_redis_connection(setting, **kwargs):
+    if setting in ("REDIS_URL", "REDIS_CLIENT_CLASS"):
+        get_redis_connection.cache_clear()
@@ -0,0 +1,41 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+__all__ = [
+    "ORJSONRenderer",
+    "dumps",
+]
+
+# The datetimes are passed to the DRF encoder, which formats them like
+# DRF does (milliseconds, "Z" for UTC), and so are the types orjson
+# doesn't know (decimals, lazy translations, querysets etc).
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+default = JSONEncoder().default
+
+
+def dumps(data, option=0):
+    """
+    Serializes the data to JSON bytes, the same as `JSONRenderer` in the
+    compact mode.
+    """
+    data = orjson.dumps(data, default=default, option=OPTIONS | option)
+    # Keeps the JSON a strict subset of JavaScript, like JSONRenderer
+    if b"\xe2\x80\xa8" in data or b"\xe2\x80\xa9" in data:
+        data = data.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return data
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` using orjson. Indented output (`indent` in the media
+    type or in the context) is rendered by `JSONRenderer`, orjson only
+    supports the indentation by two spaces.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,224 @@
+"""
+Routing of the reads to the database replicas.
+
+Within the requests handled by `replica_middleware`, the reads of the safe
+requests (GET, HEAD, OPTIONS) go to one of the `REPLICA_DATABASES` aliases,
+everything else goes to the primary. The reads outside of the requests
+(Celery tasks, management commands) stay on the primary as well.
+
+A request which writes pins its user to the primary for
+`REPLICA_PIN_SECONDS`, so the user reads their own writes even if the
+replicas are behind: by a cookie for the browser sessions and by a Redis
+key for the API clients authenticated by a JWT. A replica lagging more than
+`REPLICA_MAX_LAG` seconds isn't used until it catches up.
+"""
+
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.redis import get_redis_connection
+
+__all__ = [
+    "ReplicaRouter",
+    "get_replication_lag",
+    "is_replica_healthy",
+    "replica_middleware",
+]
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_COOKIE = "replica_pin"
+PIN_KEY = "replicas:pinned:{user_id}"
+
+LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+request_state = ContextVar("replica_request_state", default=None)
+# alias -> (time of the check, healthy)
+lag_checks = {}
+
+
+class RequestState:
+    def __init__(self, request):
+        self.request = request
+        self.written = []
+        # Computed on the first read, the requests without reads don't
+        # touch Redis
+        self._pinned = None if request.method in SAFE_METHODS else True
+
+    @property
+    def pinned(self):
+        if self._pinned is None:
+            self._pinned = PIN_COOKIE in self.request.COOKIES or is_token_user_pinned(self.request)
+        return self._pinned
+
+    def write(self, instance):
+        self._pinned = True
+        self.written.append(instance)
+
+    def get_written_user_ids(self):
+        """
+        Returns the ids of the users whose reads must be pinned: the user of
+        the request and the users saved by it (e.g. registered).
+        """
+        user_model = get_user_model()
+        user_ids = {instance.pk for instance in self.written if isinstance(instance, user_model) and instance.pk}
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated:
+            user_ids.add(user.pk)
+        return user_ids
+
+
+def get_token_user_id(request):
+    """
+    Returns the user id from the bearer token without verifying it, the
+    worst a forged token can do is to pin its requests to the primary.
+    """
+    auth = request.headers.get("Authorization", "").split()
+    if len(auth) != 2 or auth[0] not in api_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(auth[1], verify=False).get(api_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+def is_token_user_pinned(request):
+    user_id = get_token_user_id(request)
+    return user_id is not None and bool(get_redis_connection().exists(PIN_KEY.format(user_id=user_id)))
+
+
+def pin_users(user_ids):
+    pipeline = get_redis_connection().pipeline()
+    for user_id in user_ids:
+        pipeline.set(PIN_KEY.format(user_id=user_id), 1, ex=settings.REPLICA_PIN_SECONDS)
+    pipeline.execute()
+
+
+def get_replication_lag(alias):
+    """
+    Returns the replication lag of the replica in seconds.
+    """
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def is_replica_healthy(alias):
+    """
+    Returns whether the replica is reachable and its lag is within
+    `REPLICA_MAX_LAG`. The result is reused for `REPLICA_LAG_CHECK_INTERVAL`
+    seconds.
+    """
+    now = time.monotonic()
+    checked_at, healthy = lag_checks.get(alias, (None, None))
+    if checked_at is not None and now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return healthy
+
+    try:
+        lag = get_replication_lag(alias)
+    except DatabaseError:
+        logger.warning("Replica %s is unreachable", alias, exc_info=True)
+        healthy = False
+    else:
+        healthy = lag <= settings.REPLICA_MAX_LAG
+        if not healthy:
+            logger.warning("Replica %s is %.1f seconds behind, reading from the primary", alias, lag)
+    lag_checks[alias] = (now, healthy)
+    return healthy
+
+
+@receiver(setting_changed)
+def reset_lag_checks(setting, **kwargs):
+    if setting in ("REPLICA_DATABASES", "REPLICA_MAX_LAG", "REPLICA_LAG_CHECK_INTERVAL"):
+        lag_checks.clear()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = request_state.get()
+        if state is None or not settings.REPLICA_DATABASES or state.pinned:
+            return None
+        # The reads inside a transaction must see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        replicas = [alias for alias in settings.REPLICA_DATABASES if is_replica_healthy(alias)]
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        state = request_state.get()
+        if state is not None:
+            state.write(hints.get("instance"))
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+def pin_written(response, state):
+    """
+    Pins the request's client to the primary if the request wrote.
+    """
+    response.set_cookie(PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax")
+    if user_ids := state.get_written_user_ids():
+        pin_users(user_ids)
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            state = RequestState(request)
+            token = request_state.set(state)
+            try:
+                response = await get_response(request)
+            finally:
+                request_state.reset(token)
+
+            if state.written and settings.REPLICA_DATABASES:
+                await sync_to_async(pin_written)(response, state)
+            return response
+
+    else:
+
+        def middleware(request):
+            state = RequestState(request)
+            token = request_state.set(state)
+            try:
+                response = get_response(request)
+            finally:
+                request_state.reset(token)
+
+            if state.written and settings.REPLICA_DATABASES:
+                pin_written(response, state)
+            return response
+
+    return middleware
@@ -0,0 +1,144 @@
+"""
+Celery task metrics exported in the same Prometheus format as the web
+metrics (see `core.metrics`).
+
+The publisher stamps every message with the time it was sent, so the
+worker records how long the task waited in the queue before it started,
+besides its runtime, retries and failures. The length of the broker queues
+is read from Redis when the metrics are scraped.
+
+The worker serves the metrics on `CELERY_METRICS_PORT`. The pool processes
+share them through `PROMETHEUS_MULTIPROC_DIR`, like the gunicorn workers.
+"""
+
+import logging
+import time
+
+from celery import signals
+from django.conf import settings
+from django.utils.module_loading import import_string
+from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from core.metrics import get_registry
+
+__all__ = [
+    "QueueLengthCollector",
+    "start_metrics_server",
+]
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_AT_HEADER = "published_at"
+
+TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds",
+    "Time spent executing the task",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time between publishing the task and starting it",
+    ["task", "queue"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+TASKS = Counter(
+    "celery_tasks",
+    "Number of executed tasks by the final state",
+    ["task", "state"],
+)
+TASK_RETRIES = Counter(
+    "celery_task_retries",
+    "Number of task retries",
+    ["task"],
+)
+TASK_FAILURES = Counter(
+    "celery_task_failures",
+    "Number of failed tasks by the exception",
+    ["task", "exception"],
+)
+
+_started = {}
+
+
+@signals.before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+def get_published_at(request):
+    # The custom headers are request attributes in the worker and are kept
+    # in `request.headers` by the eager mode
+    return request.get(PUBLISHED_AT_HEADER) or (request.headers or {}).get(PUBLISHED_AT_HEADER)
+
+
+@signals.task_prerun.connect
+def task_started(task_id=None, task=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+    published_at = get_published_at(task.request)
+    if published_at:
+        queue = (task.request.delivery_info or {}).get("routing_key") or task.app.conf.task_default_queue
+        TASK_QUEUE_WAIT.labels(task.name, queue).observe(max(time.time() - published_at, 0))
+
+
+@signals.task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(task.name).observe(time.perf_counter() - started)
+    TASKS.labels(task.name, state or "UNKNOWN").inc()
+
+
+@signals.task_retry.connect
+def task_retried(sender=None, **kwargs):
+    TASK_RETRIES.labels(sender.name).inc()
+
+
+@signals.task_failure.connect
+def task_failed(sender=None, exception=None, **kwargs):
+    TASK_FAILURES.labels(sender.name, type(exception).__name__).inc()
+
+
+class QueueLengthCollector:
+    """
+    Reads the number of the waiting messages of the broker queues with
+    LLEN on every scrape.
+    """
+
+    def __init__(self, app, redis=None):
+        self.app = app
+        self.redis = redis
+
+    def get_queues(self):
+        queues = {self.app.conf.task_default_queue}
+        queues.update(queue.name for queue in self.app.conf.task_queues or ())
+        return sorted(queues)
+
+    def get_redis(self):
+        if self.redis is None:
+            self.redis = import_string(settings.REDIS_CLIENT_CLASS).from_url(self.app.conf.broker_url)
+        return self.redis
+
+    def collect(self):
+        metric = GaugeMetricFamily("celery_queue_length", "Number of messages waiting in the queue", labels=["queue"])
+        queues = self.get_queues()
+        with self.get_redis().pipeline(transaction=False) as pipe:
+            for queue in queues:
+                pipe.llen(queue)
+            lengths = pipe.execute()
+        for queue, length in zip(queues, lengths, strict=True):
+            metric.add_metric([queue], length)
+        yield metric
+
+
+@signals.worker_ready.connect
+def start_metrics_server(sender=None, **kwargs):
+    port = settings.CELERY_METRICS_PORT
+    if not port:
+        return
+    registry = get_registry()
+    registry.register(QueueLengthCollector(sender.app))
+    start_http_server(port, registry=registry)
+    logger.info("Serving the task metrics on port %s", port)
@@ -0,0 +1,717 @@
+import datetime
+import json
+import threading
+import time
+import uuid
+import zoneinfo
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.utils.translation import gettext_lazy
+from fakeredis import FakeConnection
+from prometheus_client import REGISTRY, CollectorRegistry
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.api.router import api_urlpatterns
+from accounts.api.serializers import UserListSerializer, UserSearchSerializer
+from accounts.cache import get_cached_user, invalidate_user_cache
+from accounts.models import User
+from accounts.revocation import get_revocation_backend
+from accounts.tasks import flush_email_outbox, send_email
+from accounts.tokens import RevocableRefreshToken
+from accounts.utils import account_activation_token
+from config import celery_app
+from core.cache import LocalCache, TieredCache, cached, namespace, tiered_cache
+from core.metrics import InstrumentedCacheMixin, metrics_middleware
+from core.parsers import ORJSONParser
+from core.query_budget import (
+    QueryBudget,
+    QueryBudgetExceeded,
+    get_query_budget,
+    query_budget,
+    query_budget_middleware,
+)
+from core.redis import get_redis_connection
+from core.renderers import ORJSONRenderer
+from core.replicas import PIN_COOKIE, ReplicaRouter, replica_middleware
+from core.serializers import CompiledReadMixin
+from core.task_metrics import PUBLISHED_AT_HEADER, QueueLengthCollector, stamp_published_at
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+@override_settings(CACHES={"default": {"BACKEND": "core.tests.InstrumentedLocMemCache"}})
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("metrics@mail.com", "Metrics User", "demo")
+        self.auth = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        self.url = reverse("accounts_api:profile")
+
+    def get_sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_is_recorded(self):
+        labels = {"view": "accounts_api:profile", "method": "GET"}
+        requests = self.get_sample("django_http_requests_total", status="200", **labels)
+        queries = self.get_sample("django_http_db_queries_sum", view="accounts_api:profile")
+        misses = self.get_sample("django_cache_requests_total", result="miss")
+
+        response = self.client.get(self.url, headers=self.auth)
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+        self.assertEqual(self.get_sample("django_http_requests_total", status="200", **labels), requests + 1)
+        self.assertEqual(self.get_sample("django_http_db_queries_sum", view="accounts_api:profile"), queries + 1)
+        self.assertGreater(self.get_sample("django_cache_requests_total", result="miss"), misses)
+        self.assertGreater(self.get_sample("django_http_request_duration_seconds_count", **labels), 0)
+        self.assertGreater(self.get_sample("django_http_response_size_bytes_count", view="accounts_api:profile"), 0)
+
+    def test_cache_hits_are_counted(self):
+        self.client.get(self.url, headers=self.auth)
+        response = self.client.get(self.url, headers=self.auth)
+        self.assertIn('desc="0 queries"', response["Server-Timing"])
+        self.assertNotIn('desc="0 hits', response["Server-Timing"])
+
+    async def test_async_request_is_recorded(self):
+        # The sync view runs in a thread under ASGI, its queries are counted
+        self.assertTrue(metrics_middleware.async_capable)
+        response = await self.async_client.get(self.url, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    def test_queries_on_new_connection_are_counted(self):
+        def view(request):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return HttpResponse()
+
+        def run():
+            # The first request of the thread creates its connection
+            try:
+                responses.append(metrics_middleware(view)(RequestFactory().get("/")))
+            finally:
+                connections.close_all()
+
+        responses = []
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertIn('desc="1 queries"', responses[0]["Server-Timing"])
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get(self.url, headers=self.auth)
+        self.assertNotIn("Server-Timing", response)
+
+    def test_metrics_endpoint(self):
+        self.client.get(self.url, headers=self.auth)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        sample = b'django_http_requests_total{method="GET",status="200",view="accounts_api:profile"}'
+        self.assertIn(sample, response.content)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        response = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+
+
+class TaskMetricsTests(TestCase):
+    def get_sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_task_is_recorded(self):
+        name = send_email.name
+        succeeded = self.get_sample("celery_tasks_total", task=name, state="SUCCESS")
+        runs = self.get_sample("celery_task_runtime_seconds_count", task=name)
+        waits = self.get_sample("celery_task_queue_wait_seconds_count", task=name, queue="celery")
+
+        send_email.apply_async((0, "Subject", "Message"), headers={PUBLISHED_AT_HEADER: time.time() - 5})
+
+        self.assertEqual(self.get_sample("celery_tasks_total", task=name, state="SUCCESS"), succeeded + 1)
+        self.assertEqual(self.get_sample("celery_task_runtime_seconds_count", task=name), runs + 1)
+        self.assertEqual(self.get_sample("celery_task_queue_wait_seconds_count", task=name, queue="celery"), waits + 1)
+        self.assertGreaterEqual(self.get_sample("celery_task_queue_wait_seconds_sum", task=name, queue="celery"), 5)
+
+    def test_failure_is_recorded(self):
+        name = flush_email_outbox.name
+        failures = self.get_sample("celery_task_failures_total", task=name, exception="ConnectionError")
+
+        with mock.patch("accounts.tasks.deliver_outbox", side_effect=ConnectionError):
+            flush_email_outbox.delay()
+
+        self.assertEqual(
+            self.get_sample("celery_task_failures_total", task=name, exception="ConnectionError"), failures + 1
+        )
+        self.assertGreater(self.get_sample("celery_tasks_total", task=name, state="FAILURE"), 0)
+
+    def test_publish_is_stamped(self):
+        headers = {}
+        stamp_published_at(headers=headers)
+        self.assertAlmostEqual(headers[PUBLISHED_AT_HEADER], time.time(), delta=1)
+
+    def test_queue_length(self):
+        redis = get_redis_connection()
+        redis.flushdb()
+        redis.rpush("celery", "a", "b")
+
+        registry = CollectorRegistry()
+        registry.register(QueueLengthCollector(celery_app, redis=redis))
+        self.assertEqual(registry.get_sample_value("celery_queue_length", {"queue": "celery"}), 2)
+
+
+@override_settings(CACHES={**settings.CACHES, "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_redis_connection().flushdb()
+
+    def test_api_routes_have_budgets(self):
+        for pattern in api_urlpatterns:
+            self.assertIn(f"accounts_api:{pattern.name}", settings.QUERY_BUDGETS)
+
+    def test_account_flow_within_budget(self):
+        response = self.client.post(
+            reverse("accounts_api:register"),
+            {"email": "budget@mail.com", "name": "Budget User", "password": "demo12345"},
+        )
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(email="budget@mail.com")
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        response = self.client.get(
+            reverse("accounts_api:activate", args=(uid, account_activation_token.make_token(user)))
+        )
+        self.assertEqual(response.status_code, 200)
+
+        credentials = {"email": "budget@mail.com", "password": "demo12345"}
+        tokens = self.client.post(reverse("accounts_api:login"), credentials).json()
+        tokens = self.client.post(reverse("token_obtain_pair"), credentials).json()
+        response = self.client.post(reverse("token_refresh"), {"refresh": tokens["refresh"]})
+        self.assertEqual(response.status_code, 200)
+
+        auth = {"Authorization": f"Bearer {tokens['access']}"}
+        profile = reverse("accounts_api:profile")
+        self.assertEqual(self.client.get(profile, headers=auth).status_code, 200)
+        response = self.client.patch(profile, {"name": "Renamed"}, content_type="application/json", headers=auth)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(
+            reverse("accounts_api:change-password"),
+            {"old_password": "demo12345", "new_password": "demo123456"},
+            content_type="application/json",
+            headers=auth,
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse("accounts_api:logout"), {"refresh": tokens["refresh"]}, headers=auth)
+        self.assertEqual(response.status_code, 204)
+
+    def test_admin_changelist_within_budget(self):
+        User.objects.bulk_create(
+            User(email=f"user{index}@mail.com", name=f"User {index}", password="!") for index in range(150)
+        )
+        self.client.force_login(User.objects.create_superuser("admin@mail.com", "Admin", "demo"))
+        response = self.client.get(reverse("admin:accounts_user_changelist"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_exceeded_budget(self):
+        self.client.force_login(User.objects.create_superuser("admin@mail.com", "Admin", "demo"))
+        url = reverse("admin:accounts_user_changelist")
+        budgets = {"admin:accounts_user_changelist": {"queries": 1}}
+        with self.settings(QUERY_BUDGETS=budgets), self.assertRaises(QueryBudgetExceeded):
+            self.client.get(url)
+
+        with self.settings(QUERY_BUDGETS=budgets, QUERY_BUDGET_MODE="warn"):
+            with self.assertLogs("core.query_budget", "WARNING") as logs:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("queries (budget 1)", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    def test_exceeded_time_is_logged(self):
+        self.client.force_login(User.objects.create_superuser("admin@mail.com", "Admin", "demo"))
+        budgets = {"admin:accounts_user_changelist": {"queries": 100, "time": 0}}
+        with self.settings(QUERY_BUDGETS=budgets), self.assertLogs("core.query_budget", "WARNING") as logs:
+            response = self.client.get(reverse("admin:accounts_user_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ms of SQL (budget 0.0 ms)", logs.output[0])
+
+    async def test_async_request(self):
+        self.assertTrue(query_budget_middleware.async_capable)
+        user = await sync_to_async(User.objects.create_superuser)("admin@mail.com", "Admin", "demo")
+        auth = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        with self.settings(QUERY_BUDGETS={"accounts_api:user-list": {"queries": 0}}):
+            with self.assertRaises(QueryBudgetExceeded):
+                await self.async_client.get(reverse("accounts_api:user-list"), headers=auth)
+
+    def test_decorated_view_budget(self):
+        request = RequestFactory().get("/")
+        request.resolver_match = ResolverMatch(query_budget(queries=3)(lambda request: None), (), {}, "decorated")
+        self.assertEqual(get_query_budget(request), QueryBudget(queries=3))
+
+
+# The replica is a test mirror of the default database, the transactions
+# are committed so that its connection sees the data
+@override_settings(REPLICA_DATABASES=["replica"])
+# The lag checks of the replica count as queries of the requests
+@override_settings(QUERY_BUDGET_MODE="")
+class ReplicaRouterTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        get_redis_connection().flushdb()
+        self.user = User.objects.create_user("replica@mail.com", "Replica User", "demo")
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.auth = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        self.url = reverse("accounts_api:user-list")
+        self.profile_url = reverse("accounts_api:profile")
+
+    def request(self, method="get", url=None, **kwargs):
+        with (
+            CaptureQueriesContext(connections["default"]) as primary,
+            CaptureQueriesContext(connections["replica"]) as replica,
+        ):
+            response = getattr(self.client, method)(url or self.url, headers=self.auth, **kwargs)
+        return response, len(primary), len(replica)
+
+    def test_safe_request_reads_from_replica(self):
+        response, primary, replica = self.request()
+        self.assertEqual(response.status_code, 200)
+        # Only the authenticated user is loaded from the primary
+        self.assertEqual(primary, 1)
+        self.assertGreater(replica, 0)
+
+    def test_write_pins_user_to_primary(self):
+        response, primary, replica = self.request(
+            "patch", self.profile_url, data={"name": "New Name"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, 0)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # The API client doesn't keep the cookie, the user is pinned in Redis
+        self.client.cookies.clear()
+        self.assertEqual(self.request(url=self.profile_url)[0].data["name"], "New Name")
+        response, primary, replica = self.request()
+        self.assertGreater(primary, 1)
+        self.assertEqual(replica, 0)
+
+        get_redis_connection().flushdb()
+        self.assertGreater(self.request()[2], 0)
+
+    async def test_async_write_pins_user_to_primary(self):
+        self.assertTrue(replica_middleware.async_capable)
+        response = await self.async_client.patch(
+            self.profile_url, {"name": "Async Name"}, content_type="application/json", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(get_redis_connection().keys("replicas:pinned:*"))
+
+    @override_settings(
+        CACHES={**settings.CACHES, "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_deactivated_user_is_cached_from_primary(self):
+        # Deactivated outside of a request (e.g. by a bulk action job), so
+        # the user isn't pinned to the primary
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        invalidate_user_cache(self.user.pk)
+        with mock.patch("core.replicas.is_replica_healthy", return_value=True):
+            response, primary, replica = self.request()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual((primary, replica), (1, 0))
+        self.assertFalse(get_cached_user(self.user.pk).is_active)
+
+    def test_lagging_replica_is_not_used(self):
+        with (
+            override_settings(REPLICA_LAG_CHECK_INTERVAL=0),
+            mock.patch("core.replicas.get_replication_lag", return_value=60.0),
+        ):
+            response, primary, replica = self.request()
+        self.assertGreater(primary, 1)
+        self.assertEqual(replica, 0)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(User))
+        self.assertFalse(ReplicaRouter().allow_migrate("replica", "accounts"))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_redis_connection().flushdb()
+        self.cache = TieredCache()
+        self.addCleanup(self.cache.reset)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def test_local_hit_skips_remote_cache(self):
+        self.cache.set("key", {"value": 1}, 60)
+        with mock.patch.object(cache, "get") as remote_get:
+            value = self.cache.get("key")
+        remote_get.assert_not_called()
+        self.assertEqual(value, {"value": 1})
+        self.assertEqual(self.cache.stats["l1_hit"], 1)
+
+        # The cached value can't be changed through the returned one
+        value["value"] = 2
+        self.assertEqual(self.cache.get("key"), {"value": 1})
+
+    def test_local_cache_is_bounded(self):
+        local = LocalCache(2)
+        local.set("a", 1, 60)
+        local.set("b", 2, 60)
+        local.get("a")
+        local.set("c", 3, 60)
+        self.assertEqual(len(local), 2)
+        self.assertEqual(local.get("a"), 1)
+        self.assertIsNot(local.get("b"), 1)
+
+    def test_invalidation_of_other_processes(self):
+        other = TieredCache()
+        self.addCleanup(other.reset)
+        self.cache.set("key", "old", 60)
+        self.assertEqual(other.get("key"), "old")
+        self.assertEqual(other.stats["l1_miss"], 1)
+        # Wait for the listener of the other cache to subscribe
+        redis = get_redis_connection()
+        self.assertTrue(self.wait_for(lambda: redis.pubsub_numsub(other.channel)[0][1]))
+
+        self.cache.set("key", "new", 60)
+        self.assertTrue(self.wait_for(lambda: other.get("key") == "new"))
+
+    def test_single_flight(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_set("key", compute, 60))) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_while_revalidate(self):
+        self.cache.set("key", "old", 1, stale_timeout=60)
+        later = time.time() + 2
+        with mock.patch("time.time", return_value=later):
+            # Another process is computing the value
+            cache.add("key:lock", "other")
+            self.assertEqual(self.cache.get_or_set("key", lambda: "new", 1, 60), "old")
+            self.assertIsNone(self.cache.get("key"))
+
+            cache.delete("key:lock")
+            self.assertEqual(self.cache.get_or_set("key", lambda: "new", 1, 60), "new")
+        self.assertEqual(self.cache.stats["l2_stale"], 2)
+
+    def test_namespace(self):
+        accounts = namespace("accounts")
+        accounts.set("key", "value", 60)
+        self.assertEqual(accounts.get("key"), "value")
+        accounts.invalidate()
+        self.assertIsNone(accounts.get("key"))
+
+    def test_cached(self):
+        calls = []
+
+        @cached(timeout=60, namespace="users")
+        def get_name(user):
+            calls.append(user.pk)
+            return user.name
+
+        user = User.objects.create_user("cached@mail.com", "Cached User", "demo")
+        self.addCleanup(tiered_cache.reset)
+        self.assertEqual(get_name(user), "Cached User")
+        self.assertEqual(get_name(User.objects.get(pk=user.pk)), "Cached User")
+        self.assertEqual(calls, [user.pk])
+
+        get_name.invalidate(user)
+        get_name(user)
+        self.assertEqual(calls, [user.pk, user.pk])
+
+    def test_cached_views(self):
+        calls = []
+
+        class UserView(APIView):
+            permission_classes = []
+
+            @cached(timeout=60)
+            def get(self, request, pk):
+                calls.append(pk)
+                return Response({"name": User.objects.get(pk=pk).name}, headers={"X-User": str(pk)})
+
+        user = User.objects.create_user("cached-view@mail.com", "Cached View", "demo")
+        self.addCleanup(tiered_cache.reset)
+        view = UserView.as_view()
+        for _ in range(2):
+            response = view(RequestFactory().get(f"/users/{user.pk}/?format=json"), pk=user.pk)
+            response.render()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["X-User"], str(user.pk))
+            self.assertEqual(json.loads(response.content), {"name": "Cached View"})
+        self.assertEqual(calls, [user.pk])
+
+        # The rendered response of the view is cached
+        cached_view = cached(timeout=60)(view)
+        for _ in range(2):
+            response = cached_view(RequestFactory().get(f"/users/{user.pk}/?format=json"), pk=user.pk)
+            self.assertTrue(response.is_rendered)
+            self.assertEqual(json.loads(response.content), {"name": "Cached View"})
+        self.assertEqual(calls, [user.pk])
+
+        view(RequestFactory().get(f"/users/{user.pk}/?page=2"), pk=user.pk)
+        self.assertEqual(calls, [user.pk, user.pk])
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://",
+            "KEY_PREFIX": "project",
+            "OPTIONS": {"connection_class": FakeConnection},
+        },
+        # In the same database
+        "revocation": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://",
+            "KEY_PREFIX": "project-revocation",
+            "OPTIONS": {"connection_class": FakeConnection},
+        },
+    }
+)
+class ClearCacheTests(TestCase):
+    def setUp(self):
+        self.redis = cache._cache.get_client(write=True)
+        self.redis.flushdb()
+        self.addCleanup(self.redis.flushdb)
+        tiered_cache.reset()
+        cache.set_many({"a": 1, "b": 2})
+        cache.set("a", 1, version=2)
+        namespace("accounts").set("user", "value", 60)
+        # Celery shares the Redis database
+        self.redis.lpush("celery", "task")
+
+    def clear_cache(self, *args):
+        out = StringIO()
+        call_command("clear_cache", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run(self):
+        self.assertIn("5 keys would be deleted", self.clear_cache("--dry-run"))
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_keeps_other_data(self):
+        self.assertIn("Deleted 5 keys", self.clear_cache("--batch-size", "2"))
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("a", version=2))
+        self.assertEqual(self.redis.lrange("celery", 0, -1), [b"task"])
+
+    def test_keeps_revoked_tokens(self):
+        refresh = RevocableRefreshToken.for_user(User.objects.create_user("revoked@mail.com", "Revoked", "demo"))
+        refresh.blacklist()
+        self.assertIn("Deleted 5 keys", self.clear_cache())
+        self.assertTrue(get_revocation_backend().is_revoked(refresh))
+
+    def test_version(self):
+        self.clear_cache("--key-version", "2")
+        self.assertIsNone(cache.get("a", version=2))
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_namespace(self):
+        self.assertIn("Deleted 2 keys", self.clear_cache("--namespace", "accounts"))
+        self.assertIsNone(namespace("accounts").get("user"))
+        self.assertEqual(cache.get("b"), 2)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class PathMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(enforce_csrf_checks=True)
+
+    def test_api_skips_browser_middleware(self):
+        user = User.objects.create_user("path@mail.com", "Path User", "demo")
+        self.client.force_login(user)
+        access = RefreshToken.for_user(user).access_token
+        response = self.client.get(reverse("accounts_api:profile"), headers={"Authorization": f"Bearer {access}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, "session"))
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+
+        # The session alone doesn't authenticate the API
+        response = self.client.get(reverse("accounts_api:profile"))
+        self.assertEqual(response.status_code, 401)
+
+    def test_browser_routes_keep_sessions_and_csrf(self):
+        response = self.client.get(reverse("admin:login"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("csrftoken", response.cookies)
+
+        response = self.client.post(reverse("admin:login"), {"username": "admin@mail.com", "password": "demo"})
+        self.assertEqual(response.status_code, 403)
+
+    async def test_async_requests(self):
+        self.async_client = AsyncClient(enforce_csrf_checks=True)
+        user = await sync_to_async(User.objects.create_user)("async-path@mail.com", "Async Path User", "demo")
+        access = RefreshToken.for_user(user).access_token
+        response = await self.async_client.get(
+            reverse("accounts_api:profile"), headers={"Authorization": f"Bearer {access}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.asgi_request, "session"))
+
+        response = await self.async_client.get(reverse("admin:login"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("csrftoken", response.cookies)
+        response = await self.async_client.post(reverse("admin:login"), {"username": "a@mail.com", "password": "demo"})
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(DEBUG=True)
+    def test_asgi_chains_are_not_adapted(self):
+        # The adaptations of the handlers are logged in debug
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler().load_middleware(is_async=True)
+
+
+class ORJSONTests(TestCase):
+    def test_renders_like_json_renderer(self):
+        data = {
+            "datetime": datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.UTC),
+            "date": datetime.date(2024, 5, 1),
+            "time": datetime.time(12, 30, 15, 123456),
+            "decimal": Decimal("1.10"),
+            "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "lazy": gettext_lazy("Invalid token"),
+            "separators": "\u2028\u2029",
+            "unicode": "Ünïcödé",
+            "nested": [{"id": 1, "none": None, "float": 1.5}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_json_renderer(self):
+        data = {"id": 1, "email": "indent@mail.com"}
+        rendered = ORJSONRenderer().render(data, "application/json; indent=4")
+        self.assertEqual(rendered, JSONRenderer().render(data, "application/json; indent=4"))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_parser(self):
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(BytesIO('{"name": "Ünïcödé"}'.encode())), {"name": "Ünïcödé"})
+        self.assertEqual(
+            parser.parse(BytesIO('{"name": "Ünïcödé"}'.encode("latin-1")), parser_context={"encoding": "latin-1"}),
+            {"name": "Ünïcödé"},
+        )
+        for data in (b"{", b'{"value": NaN}', b"\xff"):
+            with self.assertRaises(ParseError):
+                parser.parse(BytesIO(data))
+
+    def test_api_parses_and_renders_json(self):
+        user = User.objects.create_user("orjson@mail.com", "ORJSON User", "demo")
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        url = reverse("accounts_api:profile")
+        response = self.client.patch(url, b"{", content_type="application/json", headers=headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.json()["detail"])
+
+        response = self.client.patch(url, {"name": "Ünïcödé"}, content_type="application/json", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()["name"], "Ünïcödé")
+
+
+class PlainUserListSerializer(serializers.ModelSerializer):
+    Meta = UserListSerializer.Meta
+
+
+class CompiledUserSerializer(CompiledReadMixin, serializers.ModelSerializer):
+    upper_name = serializers.SerializerMethodField()
+    joined = serializers.DateTimeField(source="date_joined", format="%Y-%m-%d")
+
+    class Meta:
+        model = User
+        fields = ("id", "email", "last_login", "upper_name", "joined")
+
+    def get_upper_name(self, user):
+        return user.name.upper() + self.context.get("suffix", "")
+
+
+class CompiledReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user("first@mail.com", "First User", "demo")
+        User.objects.create_user("second@mail.com", "Second User", "demo", is_verified=True)
+        User.objects.filter(email="second@mail.com").update(is_staff=True)
+
+    def test_represents_like_model_serializer(self):
+        users = User.objects.order_by("pk")
+        expected = PlainUserListSerializer(users, many=True).data
+        self.assertEqual(UserListSerializer(users, many=True).data, expected)
+
+        rows = users.values(*UserListSerializer.get_value_fields())
+        with self.assertNumQueries(1):
+            self.assertEqual(UserListSerializer(rows, many=True).data, expected)
+
+        with timezone.override(zoneinfo.ZoneInfo("Asia/Tokyo")):
+            self.assertEqual(UserListSerializer(users, many=True).data, PlainUserListSerializer(users, many=True).data)
+
+    def test_plan(self):
+        self.assertEqual(
+            [(name, source) for name, source, _ in CompiledUserSerializer.get_read_plan()],
+            [
+                ("id", "id"),
+                ("email", "email"),
+                ("last_login", "last_login"),
+                ("upper_name", None),
+                ("joined", "date_joined"),
+            ],
+        )
+        self.assertIs(UserListSerializer.get_read_plan(), UserListSerializer.get_read_plan())
+
+        user = User.objects.get(email="first@mail.com")
+        user.last_login = None
+        data = CompiledUserSerializer(user, context={"suffix": "!"}).data
+        self.assertEqual(data["upper_name"], "FIRST USER!")
+        self.assertEqual(data["joined"], user.date_joined.strftime("%Y-%m-%d"))
+        self.assertIsNone(data["last_login"])
+
+        # The annotations are rendered by their fields
+        user.rank = 0.5
+        self.assertEqual(UserSearchSerializer(user).data["rank"], 0.5)
@@ -0,0 +1,105 @@
+import math
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core.redis import get_redis_connection
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parses the rate in the DRF format ("5/min") into the number of allowed
+    requests and the window duration in seconds.
+    """
+    num, period = rate.split("/")
+    return int(num), DURATIONS[period[0]]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Sliding window rate limiting in Redis.
+
+    Every request is counted by client IP, by the target email from the
+    request data and globally for the scope. The limits come from
+    `DEFAULT_THROTTLE_RATES` under the "<scope>_ip", "<scope>_email" and
+    "<scope>_global" names, a missing rate disables the corresponding limit.
+    All the counters are updated in a single Redis round-trip.
+
+    The window is approximated from two fixed windows: the count of the
+    previous window is weighted by the part of it which still overlaps the
+    sliding window.
+    """
+
+    scope = None
+    key_types = ("ip", "email", "global")
+    email_field = "email"
+    key_format = "throttle:{scope}:{key_type}:{ident}:{window}"
+
+    def __init__(self):
+        if not self.scope:
+            raise ImproperlyConfigured(f"You must set the scope for '{type(self).__name__}' throttle")
+        self.rates = {}
+        for key_type in self.key_types:
+            rate = api_settings.DEFAULT_THROTTLE_RATES.get(f"{self.scope}_{key_type}")
+            if rate:
+                self.rates[key_type] = parse_rate(rate)
+        self.retry_after = None
+
+    def get_email(self, request):
+        try:
+            email = request.data.get(self.email_field)
+        except (AttributeError, ParseError):
+            return None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+    def get_idents(self, request):
+        for key_type, (num_requests, duration) in self.rates.items():
+            if key_type == "ip":
+                ident = self.get_ident(request)
+            elif key_type == "email":
+                ident = self.get_email(request)
+            else:
+                ident = "all"
+            if ident:
+                yield key_type, ident, num_requests, duration
+
+    def allow_request(self, request, view):
+        limits = list(self.get_idents(request))
+        if not limits:
+            return True
+
+        now = time.time()
+        with get_redis_connection().pipeline(transaction=False) as pipe:
+            for key_type, ident, _, duration in limits:
+                window = int(now // duration)
+                key = self.key_format.format(scope=self.scope, key_type=key_type, ident=ident, window=window)
+                pipe.incr(key)
+                pipe.expire(key, duration * 2)
+                pipe.get(self.key_format.format(scope=self.scope, key_type=key_type, ident=ident, window=window - 1))
+            results = pipe.execute()
+
+        waits = []
+        for i, (_, _, num_requests, duration) in enumerate(limits):
+            current, previous = results[i * 3], int(results[i * 3 + 2] or 0)
+            elapsed = (now % duration) / duration
+            if previous * (1 - elapsed) + current <= num_requests:
+                continue
+            if current > num_requests or not previous:
+                # Wait for the next window
+                waits.append((1 - elapsed) * duration)
+            else:
+                # Wait until the previous window's weight decays enough
+                waits.append(((1 - (num_requests - current) / previous) - elapsed) * duration)
+
+        if waits:
+            self.retry_after = max(math.ceil(max(waits)), 1)
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
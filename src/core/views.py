@@ -1,5 +1,25 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from core.metrics import get_registry
 
 
 def index(request):
     return render(request, "index.html", {})
+
+
+@require_GET
+def metrics(request):
+    """
+    Exports the metrics in the Prometheus text format. If `METRICS_TOKEN`
+    is set, the scraper must send it as "Authorization: Bearer <token>".
+    """
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)